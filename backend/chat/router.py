@@ -22,13 +22,25 @@
 #         return {"answer": "Internal error. Check backend logs."}
 
 # backend/chat/router.py
+import json
+from datetime import datetime
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from auth.jwt import get_current_user
-from database import get_db
-from qa.qa_service import answer_question
+from database import SessionLocal, get_db
+from qa.qa_service import (
+    answer_question,
+    prepare_answer,
+    remember_answer,
+    run_blocking,
+    selected_repos,
+    stream_llm_answer,
+    submit_blocking,
+)
 from chat.models import ChatSession, ChatMessage
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -112,12 +124,11 @@ def get_session_messages(
     }
 
 
-@router.post("/query")
-def query_chat(
-    payload: ChatRequest,
-    user=Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
+def open_chat_turn(payload: ChatRequest, user, db: Session) -> int:
+    """
+    Resolves (or creates) the chat session, stores the user's message and
+    returns the session id.
+    """
     # 1) Resolve or create session
     session: ChatSession | None = None
 
@@ -143,24 +154,104 @@ def query_chat(
     )
     db.add(user_msg)
     db.commit()
+    return session.id
 
-    # 3) Get LLM answer (your multi-repo RAG)
-    rag_response = answer_question(payload.question, user, db)
-    answer_text = rag_response["answer"] if isinstance(rag_response, dict) else str(rag_response)
 
-    # 4) Store assistant message
+def store_assistant_message(db: Session, session_id: int, content: str):
     assistant_msg = ChatMessage(
-        session_id=session.id,
+        session_id=session_id,
         role="assistant",
-        content=answer_text,
+        content=content,
     )
     db.add(assistant_msg)
 
-    # 5) Update session timestamp
-    session.updated_at = assistant_msg.created_at
+    # Update session timestamp
+    db.query(ChatSession).filter(ChatSession.id == session_id).update({"updated_at": datetime.utcnow()})
     db.commit()
 
+
+def save_assistant_message(session_id: int, content: str):
+    """
+    store_assistant_message with its own db session, for when the request's
+    session may already be closed (end of a stream).
+    """
+    db = SessionLocal()
+    try:
+        store_assistant_message(db, session_id, content)
+    except Exception as e:
+        print("CHAT SAVE ERROR:", e)
+    finally:
+        db.close()
+
+
+@router.post("/query")
+async def query_chat(
+    payload: ChatRequest,
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    session_id = await run_blocking(open_chat_turn, payload, user, db)
+
+    # 3) Get LLM answer (your multi-repo RAG)
+    rag_response = await answer_question(payload.question, user, db)
+    answer_text = rag_response["answer"] if isinstance(rag_response, dict) else str(rag_response)
+
+    # 4) Store assistant message
+    await run_blocking(store_assistant_message, db, session_id, answer_text)
+
     return {
-        "session_id": session.id,
+        "session_id": session_id,
         "answer": answer_text,
-    }
\ No newline at end of file
+    }
+
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/query/stream")
+async def query_chat_stream(
+    payload: ChatRequest,
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Same as /chat/query, as server-sent events:
+    - `sources`: session id and retrieved sources, sent before the LLM starts
+    - `token`: answer text as it is generated
+    - `done` / `error`: end of stream
+    The assistant message is stored when the stream ends, including when the
+    client disconnects part-way (whatever was generated so far is kept).
+    """
+    session_id = await run_blocking(open_chat_turn, payload, user, db)
+    repos = await run_blocking(selected_repos, user, db)
+    response, prompt = await run_blocking(prepare_answer, payload.question, repos)
+
+    async def events():
+        yield sse("sources", {"session_id": session_id, "sources": response.get("sources", [])})
+
+        parts = []
+        try:
+            if prompt is None:
+                parts.append(response["answer"])
+                yield sse("token", {"text": response["answer"]})
+            else:
+                async for text in stream_llm_answer(prompt):
+                    parts.append(text)
+                    yield sse("token", {"text": text})
+                await run_blocking(remember_answer, payload.question, repos, {"answer": "".join(parts), **response})
+            yield sse("done", {"session_id": session_id})
+        except Exception as e:
+            print("CHAT STREAM ERROR:", e)
+            yield sse("error", {"detail": "Internal error. Check backend logs."})
+        finally:
+            # Runs on completion, error and disconnect. Not awaited: after a
+            # disconnect this code runs inside an already-cancelled scope
+            if parts:
+                submit_blocking(save_assistant_message, session_id, "".join(parts))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 import jwt
 import os
 
+from auth.jwt import get_current_user
+from qa.answer_cache import answer_cache
+
 router = APIRouter()
 
 @router.get("/debug/token")
@@ -15,4 +18,9 @@ def debug_token(token: str):
         decoded["sub"] = int(decoded["sub"])
         return {"valid": True, "decoded": decoded}
     except Exception as e:
-        return {"valid": False, "error": str(e)}
\ No newline at end of file
+        return {"valid": False, "error": str(e)}
+
+
+@router.get("/debug/answer-cache")
+def debug_answer_cache(user=Depends(get_current_user)):
+    return answer_cache.stats()
@@ -0,0 +1,84 @@
+import os
+import hashlib
+from array import array
+from dotenv import load_dotenv
+
+from embeddings.model_registry import EMBEDDING_MODEL_NAME, get_embedding_model
+from sqlite_lru import SQLiteLRUCache, process_singleton
+
+load_dotenv()
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") == "1"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+# ~1.6KB per MiniLM vector, so the default tops out around 800MB on disk
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Line endings and trailing whitespace never change what the code means,
+    so they shouldn't cause a cache miss either.
+    """
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """
+    On-disk embedding cache keyed by (model name, hash of normalized text).
+
+    Vectors are stored as float32 blobs and shared by every indexing process
+    through SQLite. Entries are evicted least-recently-used once the cache
+    grows past max_entries.
+    """
+
+    table = "embeddings"
+    value_column = "vector"
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        super().__init__(path, max_entries)
+
+    def encode_value(self, vector) -> bytes:
+        return array("f", vector).tobytes()
+
+    def decode_value(self, blob: bytes):
+        return array("f", blob).tolist()
+
+
+get_embedding_cache = process_singleton(EmbeddingCache, EMBEDDING_CACHE_ENABLED)
+
+
+def encode_with_cache(texts, model_name: str | None = None):
+    """
+    Embeds texts with the shared model, only calling model.encode for texts
+    not already in the embedding cache. Returns one vector (list of floats) per text.
+    """
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    cache = get_embedding_cache()
+
+    def encode(batch):
+        vectors = get_embedding_model(model_name).encode(batch, batch_size=len(batch), show_progress_bar=False)
+        return vectors.tolist() if hasattr(vectors, "tolist") else [list(v) for v in vectors]
+
+    if cache is None:
+        return encode(texts)
+
+    keys = [cache_key(model_name, text) for text in texts]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+
+    # Encode each missing text once, even if it repeats within the batch
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        vectors = encode(list(missing.values()))
+        computed = dict(zip(missing.keys(), vectors))
+        cache.put_many(computed.items())
+        found.update(computed)
+
+    return [found[key] for key in keys]
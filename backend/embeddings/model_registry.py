@@ -0,0 +1,45 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Must match the model the vector stores were built with
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# "cpu", "cuda", "mps"...; unset lets sentence-transformers pick
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or None
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_embedding_model(name: str | None = None):
+    """
+    Process-wide SentenceTransformer instance, loaded on first use.
+    Indexing, retrieval and QA all share it, so weights are loaded once per process.
+    """
+    name = name or EMBEDDING_MODEL_NAME
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            # Imported here: pulling in torch is most of the load time
+            from sentence_transformers import SentenceTransformer
+
+            print(f"🧠 Loading embedding model {name} (device={EMBEDDING_DEVICE or 'auto'})…")
+            model = SentenceTransformer(name, device=EMBEDDING_DEVICE)
+            _models[name] = model
+    return model
+
+
+def warmup_embedding_model():
+    """
+    Loads the model and runs one tiny encode so the first real request
+    doesn't pay for weight loading or kernel initialisation.
+    """
+    get_embedding_model().encode(["warmup"], show_progress_bar=False)
+    print(f"🟢 Embedding model ready: {EMBEDDING_MODEL_NAME}")
@@ -0,0 +1,164 @@
+import os
+import base64
+import gzip
+import json
+import re
+import zlib
+from collections import defaultdict
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NEAR_DUPLICATE_DEDUP = os.getenv("NEAR_DUPLICATE_DEDUP", "1") == "1"
+# Estimated Jaccard similarity (over token shingles) at which two chunks count as copies
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+# Chunks with fewer tokens are always kept: tiny functions look alike without being copies
+NEAR_DUPLICATE_MIN_TOKENS = int(os.getenv("NEAR_DUPLICATE_MIN_TOKENS", "40"))
+# Duplicate locations listed in a representative's metadata (the count is always exact)
+MAX_LISTED_DUPLICATES = 50
+
+DEDUP_INDEX_FILE = "dedup.json.gz"
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 similarity become candidates, which
+# are then checked against the threshold on the full signature
+BANDS, ROWS = 16, 8
+_PRIME = np.uint64(4294967311)  # first prime above 2**32
+_rng = np.random.default_rng(1729)  # fixed: signatures are persisted across runs
+_A = _rng.integers(1, 2**31, NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, 2**31, NUM_PERM, dtype=np.uint64)[:, None]
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def minhash(text: str):
+    """
+    MinHash signature (NUM_PERM uint32) over SHINGLE_SIZE-token shingles,
+    or None when the text is too short to compare meaningfully.
+    """
+    tokens = TOKEN.findall(text)
+    if len(tokens) < NEAR_DUPLICATE_MIN_TOKENS:
+        return None
+    shingles = {
+        zlib.crc32("\x1f".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"))
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # a * h stays below 2**63 (a < 2**31, h < 2**32), so no uint64 overflow
+    return ((_A * hashes + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """
+    Per-repo LSH index of representative chunks, saved next to the vector store.
+
+    Each representative keeps its path, MinHash signature and the locations
+    of the near-duplicates that were folded into it (only the representative
+    is embedded). Like the lexical index, entries are dropped by path during
+    incremental re-indexing.
+    """
+
+    def __init__(self, reps=None):
+        # rep_id -> [path, signature (base64 uint32), [[path, name, start_line, end_line], ...]]
+        self.reps = reps or {}
+        self.dirty = set()
+        self._signatures = {}
+        self._buckets = defaultdict(list)
+        for rep_id, (_, encoded, _) in self.reps.items():
+            signature = np.frombuffer(base64.b64decode(encoded), dtype=np.uint32)
+            self._index(rep_id, signature)
+
+    @classmethod
+    def load(cls, persist_dir) -> "NearDuplicateIndex | None":
+        path = Path(persist_dir) / DEDUP_INDEX_FILE
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, persist_dir):
+        path = Path(persist_dir) / DEDUP_INDEX_FILE
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(self.reps, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _index(self, rep_id, signature):
+        self._signatures[rep_id] = signature
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            self._buckets[key].append(rep_id)
+
+    def add(self, doc_id: str, chunk: dict):
+        """
+        Returns the id of the representative this chunk duplicates (recording
+        the chunk's location on it), or None if the chunk should be embedded.
+        """
+        signature = minhash(chunk["code"])
+        if signature is None:
+            return None
+
+        seen = set()
+        for band in range(BANDS):
+            key = (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+            for rep_id in self._buckets.get(key, ()):
+                if rep_id in seen:
+                    continue
+                seen.add(rep_id)
+                if rep_id == doc_id:
+                    return rep_id
+                if np.mean(self._signatures[rep_id] == signature) >= NEAR_DUPLICATE_THRESHOLD:
+                    self.reps[rep_id][2].append(
+                        [chunk["path"], chunk.get("name"), chunk.get("start_line"), chunk.get("end_line")]
+                    )
+                    self.dirty.add(rep_id)
+                    return rep_id
+
+        self.reps[doc_id] = [chunk["path"], base64.b64encode(signature.tobytes()).decode("ascii"), []]
+        self._index(doc_id, signature)
+        return None
+
+    def remove_paths(self, paths) -> set:
+        """
+        Forgets representatives in `paths` and duplicate locations in `paths`.
+        Returns the other paths that held duplicates of a removed
+        representative: nothing embedded covers them anymore, so they have
+        to be re-indexed too.
+        """
+        paths = set(paths)
+        orphaned = set()
+        for rep_id in [r for r, (path, _, _) in self.reps.items() if path in paths]:
+            orphaned.update(dup[0] for dup in self.reps.pop(rep_id)[2])
+            self._signatures.pop(rep_id)
+            self.dirty.discard(rep_id)
+        for rep_id, (_, _, dups) in self.reps.items():
+            kept = [dup for dup in dups if dup[0] not in paths]
+            if len(kept) != len(dups):
+                dups[:] = kept
+                self.dirty.add(rep_id)
+
+        self._buckets = defaultdict(list)
+        for rep_id, signature in list(self._signatures.items()):
+            self._index(rep_id, signature)
+        return orphaned - paths
+
+    def metadata_updates(self):
+        """
+        (ids, metadatas) for representatives whose duplicate list changed since
+        the last call; Chroma merges these keys into the stored metadata.
+        """
+        ids, metadatas = [], []
+        for rep_id in sorted(self.dirty):
+            if rep_id not in self.reps:
+                continue
+            dups = self.reps[rep_id][2]
+            ids.append(rep_id)
+            metadatas.append({
+                "duplicate_count": len(dups),
+                "duplicates": json.dumps(dups[:MAX_LISTED_DUPLICATES]),
+            })
+        self.dirty.clear()
+        return ids, metadatas
@@ -0,0 +1,153 @@
+import os
+import queue
+import threading
+import time
+from itertools import islice
+
+# Texts per model.encode call
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Records per collection.upsert call (also capped by Chroma's own max batch size)
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "1024"))
+# Batches allowed to wait between two stages; bounds peak memory
+PIPELINE_QUEUE_DEPTH = int(os.getenv("PIPELINE_QUEUE_DEPTH", "4"))
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up once another stage has failed.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def max_write_batch(client) -> int:
+    get_max = getattr(client, "get_max_batch_size", None)
+    if get_max is None:
+        return WRITE_BATCH_SIZE
+    return max(1, min(WRITE_BATCH_SIZE, get_max()))
+
+
+def run_pipeline(records, encode, collection, write_batch_size=WRITE_BATCH_SIZE, label="", on_progress=None, metrics=None):
+    """
+    Streams (id, document, metadata) records into a Chroma collection.
+
+    extract -> encode -> write run as overlapping stages connected by bounded
+    queues: a reader thread pulls records (driving extraction) into
+    EMBED_BATCH_SIZE batches, an encoder thread embeds each batch with
+    `encode(texts)`, and the calling thread upserts in write_batch_size
+    batches. At most PIPELINE_QUEUE_DEPTH batches wait at each hop, so memory
+    stays flat regardless of repo size.
+
+    on_progress(written) is called after every write; if it raises (e.g. the
+    job was cancelled) the pipeline stops like on any other error.
+    metrics: optional IndexMetrics, receives extract / embed / write timings.
+
+    Returns the number of records written. An error in any stage stops the
+    others and is re-raised here.
+    """
+    stop = threading.Event()
+    to_encode = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    to_write = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+
+    def read():
+        try:
+            it = iter(records)
+            while not stop.is_set():
+                start = time.perf_counter()
+                batch = list(islice(it, EMBED_BATCH_SIZE))
+                if metrics:
+                    metrics.add_time("extract", time.perf_counter() - start)
+                if not batch:
+                    break
+                if not _put(to_encode, batch, stop):
+                    return
+            _put(to_encode, _DONE, stop)
+        except BaseException as e:
+            _put(to_encode, _Failed(e), stop)
+
+    def embed():
+        try:
+            while not stop.is_set():
+                batch = _get(to_encode, stop)
+                if batch is _DONE or isinstance(batch, _Failed):
+                    _put(to_write, batch, stop)
+                    return
+                ids, documents, metadatas = zip(*batch)
+                start = time.perf_counter()
+                embeddings = encode(list(documents))
+                if metrics:
+                    metrics.add_time("embed", time.perf_counter() - start)
+                    metrics.count("embedded", len(documents))
+                    metrics.count("document_chars", sum(len(d) for d in documents))
+                if hasattr(embeddings, "tolist"):
+                    embeddings = embeddings.tolist()
+                if not _put(to_write, (list(ids), list(documents), list(metadatas), embeddings), stop):
+                    return
+        except BaseException as e:
+            _put(to_write, _Failed(e), stop)
+
+    threads = [
+        threading.Thread(target=read, name="index-read", daemon=True),
+        threading.Thread(target=embed, name="index-embed", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    written = 0
+    pending = ([], [], [], [])
+
+    def write(batch):
+        nonlocal written
+        ids, documents, metadatas, embeddings = batch
+        start = time.perf_counter()
+        collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        if metrics:
+            metrics.add_time("write", time.perf_counter() - start)
+            metrics.count("records_written", len(ids))
+        written += len(ids)
+        print(f"💾 {label}{written} items written")
+        if on_progress:
+            on_progress(written)
+
+    try:
+        while True:
+            item = to_write.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failed):
+                raise item.error
+
+            for bucket, values in zip(pending, item):
+                bucket.extend(values)
+            while len(pending[0]) >= write_batch_size:
+                write(tuple(bucket[:write_batch_size] for bucket in pending))
+                pending = tuple(bucket[write_batch_size:] for bucket in pending)
+        if pending[0]:
+            write(pending)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5)
+
+    return written
@@ -1,27 +1,203 @@
 import os
+import hashlib
+from contextlib import nullcontext
 from pathlib import Path
 from chromadb import PersistentClient
 from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from extraction.extract_data import run_extraction
+from embeddings.embedding_cache import encode_with_cache, get_embedding_cache
+from embeddings.near_duplicates import DEDUP_INDEX_FILE, NEAR_DUPLICATE_DEDUP, NearDuplicateIndex
+from embeddings.pipeline import run_pipeline, max_write_batch
+from extraction.extract_data import iter_code_chunks, iter_commits, get_head_sha, get_changed_files, is_ancestor
+from ingestion.index_metrics import dir_size
+from retrieval.commit_index import CommitIndex
+from retrieval.lexical_index import LEXICAL_INDEX_FILE, LexicalIndex
+from retrieval.symbol_index import SYMBOL_INDEX_FILE, SymbolIndex
+from retrieval.vectorstore_pool import (
+    COLLECTION_NAME,
+    COMMIT_COLLECTION_NAME,
+    INDEX_READY_FILE,
+    invalidate_vectorstore,
+    vectorstore_path,
+)
 
-VECTOR_BASE_DIR = "vector_store"
+# Changed paths listed in a commit's embedded document (all of them go to the commit index)
+COMMIT_DOC_MAX_FILES = 20
 
-def create_vector_store(repo_id: int, repo_path: str):
+
+def chunk_id(chunk: dict) -> str:
+    """
+    Stable, content-addressed ID for a code chunk.
+    Unchanged functions keep their ID across re-indexes.
+    """
+    key = "\0".join([chunk["path"], chunk["type"], chunk["name"], chunk["code"]])
+    return "code_" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def commit_id(commit: dict) -> str:
+    return f"commit_{commit['sha']}"
+
+
+def iter_records(code_chunks):
+    """
+    Turns extracted chunks into (id, document, metadata) records, lazily.
+    Duplicate IDs (identical definitions in the same file) are kept once.
+    """
+    seen = set()
+
+    # Add code chunks
+    for chunk in code_chunks:
+        cid = chunk_id(chunk)
+        if cid in seen:
+            continue
+        seen.add(cid)
+        metadata = {
+            "type": chunk["type"],
+            "language": chunk["language"],
+            "path": chunk["path"],
+            "name": chunk["name"],
+        }
+        # Optional fields; Chroma rejects None values so only set what the extractor gave us
+        for key in ("start_line", "end_line", "parent", "children", "part", "outline"):
+            if chunk.get(key) is not None:
+                metadata[key] = chunk[key]
+        yield cid, chunk["code"], metadata
+
+
+def commit_record(commit: dict):
+    """
+    (id, document, metadata) for a commit: its full message plus the paths it changed.
+    """
+    paths = [path for path, _, _ in commit["files"]]
+    document = commit["message"]
+    if paths:
+        listed = "\n".join(paths[:COMMIT_DOC_MAX_FILES])
+        more = f"\n... and {len(paths) - COMMIT_DOC_MAX_FILES} more" if len(paths) > COMMIT_DOC_MAX_FILES else ""
+        document += f"\n\nChanged files:\n{listed}{more}"
+
+    metadata = {
+        "type": "commit",
+        "sha": commit["sha"],
+        "date": commit["date"],
+        "author": commit["author"],
+        "files_changed": len(paths),
+    }
+    known = [f for f in commit["files"] if f[1] is not None]
+    if known:
+        metadata["added"] = sum(f[1] for f in known)
+        metadata["deleted"] = sum(f[2] for f in known)
+    return commit_id(commit), document, metadata
+
+
+def index_commits(client, persist_dir, repo_path: Path, head_sha: str, progress=None) -> int:
+    """
+    Embeds the commits after the commit index's head into the commit
+    collection and records the files they changed (retrieval/commit_index.py).
+    History is streamed from git log, and only read from the start when
+    nothing was indexed yet or a force push dropped the old head.
+    Returns the number of commits indexed.
+    """
+    commit_index = CommitIndex(persist_dir)
+    try:
+        since_sha = commit_index.head()
+        if since_sha == head_sha:
+            return 0
+        if since_sha and not is_ancestor(repo_path, since_sha):
+            print(f"♻️ {since_sha[:12]} is no longer in history, re-indexing all commits")
+            commit_index.clear()
+            client.get_or_create_collection(COMMIT_COLLECTION_NAME)
+            client.delete_collection(COMMIT_COLLECTION_NAME)
+            since_sha = None
+        collection = client.get_or_create_collection(COMMIT_COLLECTION_NAME)
+
+        def records():
+            for commit in iter_commits(repo_path, since_sha=since_sha):
+                commit_index.add(commit)
+                yield commit_record(commit)
+
+        written = run_pipeline(
+            records(),
+            encode_with_cache,
+            collection,
+            write_batch_size=max_write_batch(client),
+            label="commits: ",
+            on_progress=(lambda written: progress("commits", written)) if progress else None,
+        )
+        # Only now: an interrupted run resumes from the previous head
+        commit_index.set_head(head_sha)
+        print(f"✅ Indexed {written} commits" + (f" since {since_sha[:12]}" if since_sha else ""))
+        return written
+    finally:
+        commit_index.close()
+
+
+def with_lexical_index(records, lexical: LexicalIndex):
+    """
+    Passes records through unchanged while adding each one to the BM25 index.
+    """
+    for record in records:
+        doc_id, document, metadata = record
+        lexical.add(doc_id, document, metadata.get("path"))
+        yield record
+
+
+def with_symbol_index(code_chunks, symbols: SymbolIndex):
+    """
+    Passes chunks through unchanged while recording each definition in the symbol table.
+    """
+    for chunk in code_chunks:
+        symbols.add_chunk(chunk)
+        yield chunk
+
+
+def without_near_duplicates(code_chunks, dedup: NearDuplicateIndex, metrics=None):
+    """
+    Drops chunks that are near-copies of an already seen one; their location
+    is recorded on that representative instead of being embedded.
+    """
+    dropped = 0
+    for chunk in code_chunks:
+        if NEAR_DUPLICATE_DEDUP and dedup.add(chunk_id(chunk), chunk) is not None:
+            dropped += 1
+            continue
+        yield chunk
+    if dropped:
+        print(f"🧬 Folded {dropped} near-duplicate chunks into their representatives")
+    if metrics:
+        metrics.count("near_duplicates_folded", dropped)
+
+
+def create_vector_store(store_id: str, repo_path: str, last_indexed_sha: str | None = None, progress=None, metrics=None):
+    """
+    Index a cloned repo into vector_store/<store_id>/.
+
+    With last_indexed_sha, only files changed between that commit and HEAD
+    are re-extracted and re-embedded; everything else is left in place.
+    Falls back to a full rebuild when the previous commit can't be diffed.
+    Chunks stream through embedding and writing in fixed-size batches
+    (see embeddings/pipeline.py), so memory does not grow with repo size.
+    A BM25 lexical index and a symbol table over the same chunks are kept
+    next to the collection. Near-duplicate chunks are embedded once, with
+    the other locations listed on the representative's metadata.
+    progress: optional callback(stage, items_done=None), may raise to abort.
+    metrics: optional IndexMetrics (ingestion/index_metrics.py) to fill in.
+    Commits go to their own collection and SQLite index (see index_commits),
+    which full rebuilds of the code index leave alone.
+    The store is marked ready (INDEX_READY_FILE) only once a run completes.
+    Returns the HEAD SHA that was indexed.
+    """
     repo_path = Path(repo_path)
 
     if not repo_path.exists():
         raise FileNotFoundError(f"❌ Repo folder missing: {repo_path}")
 
-    # Extract code + commits
-    code_chunks, commits = run_extraction(repo_path)
+    head_sha = get_head_sha(repo_path)
 
-    # Make folder: vector_store/<repo_id>/
-    persist_dir = Path(VECTOR_BASE_DIR) / str(repo_id)
+    # Make folder: vector_store/<store_id>/
+    persist_dir = vectorstore_path(store_id)
     persist_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load embedding model
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    # Pooled query clients must not keep serving the collection we're about to rewrite
+    invalidate_vectorstore(store_id)
 
     # Init chroma
     client = PersistentClient(
@@ -29,41 +205,114 @@ def create_vector_store(repo_id: int, repo_path: str):
         settings=Settings(anonymized_telemetry=False)
     )
 
-    collection = client.get_or_create_collection("devmemory")
+    collection = client.get_or_create_collection(COLLECTION_NAME)
+    store_bytes_before = dir_size(persist_dir) if metrics else 0
 
-    documents = []
-    metadatas = []
-    ids = []
+    # Stores built before the lexical / symbol / dedup indexes existed, or whose
+    # last run didn't finish, need one full rebuild
+    lexical = LexicalIndex.load(persist_dir)
+    symbols = SymbolIndex.load(persist_dir)
+    dedup = NearDuplicateIndex.load(persist_dir)
+    sidecars_ready = lexical is not None and symbols is not None and dedup is not None
+    sidecars_ready = sidecars_ready and (persist_dir / INDEX_READY_FILE).exists()
 
-    # Add code chunks
-    for i, chunk in enumerate(code_chunks):
-        documents.append(chunk["code"])
-        metadatas.append({
-            "type": chunk["type"],
-            "language": chunk["language"],
-            "path": chunk["path"],
-            "name": chunk["name"],
-        })
-        ids.append(f"code_{i}")
-
-    # Add commits
-    for i, commit in enumerate(commits):
-        documents.append(commit["message"])
-        metadatas.append({
-            "type": "commit",
-            "sha": commit["sha"],
-            "date": commit["date"],
-        })
-        ids.append(f"commit_{i}")
-
-    print(f"🔧 Generating embeddings for repo {repo_id} ({len(documents)} items)…")
-    embeddings = model.encode(documents, show_progress_bar=True)
-
-    collection.add(
-        documents=documents,
-        embeddings=embeddings,
-        metadatas=metadatas,
-        ids=ids
+    diff = None
+    if last_indexed_sha and head_sha and collection.count() > 0 and sidecars_ready:
+        if last_indexed_sha == head_sha:
+            print(f"🟢 Store {store_id} already indexed at {head_sha}")
+            if metrics:
+                metrics.info["mode"] = "up_to_date"
+            return head_sha
+        diff = get_changed_files(repo_path, last_indexed_sha)
+
+    if diff is None:
+        # Full rebuild: start from an empty collection so no stale chunks survive.
+        # Sidecars go first: if this run is aborted, the next one rebuilds again
+        # instead of diffing against a half-written collection
+        for name in (INDEX_READY_FILE, LEXICAL_INDEX_FILE, SYMBOL_INDEX_FILE, DEDUP_INDEX_FILE):
+            (persist_dir / name).unlink(missing_ok=True)
+        client.delete_collection(COLLECTION_NAME)
+        collection = client.create_collection(COLLECTION_NAME)
+        lexical = LexicalIndex()
+        symbols = SymbolIndex()
+        dedup = NearDuplicateIndex()
+        code_chunks = iter_code_chunks(repo_path, metrics=metrics)
+        mode = "full"
+    else:
+        changed, deleted = diff
+        print(f"🔁 Incremental index for store {store_id}: {len(changed)} changed, {len(deleted)} deleted files")
+
+        stale = {str(repo_path / p) for p in changed | deleted}
+        # Unchanged files whose chunks were folded into a representative in a
+        # stale file lose their only embedding, so they are re-indexed as well
+        frontier = stale
+        while frontier:
+            frontier = dedup.remove_paths(frontier) - stale
+            stale |= frontier
+            changed |= {Path(p).relative_to(repo_path).as_posix() for p in frontier}
+
+        stale_paths = sorted(stale)
+        if stale_paths:
+            collection.delete(where={"path": {"$in": stale_paths}})
+            lexical.remove_paths(stale_paths)
+            symbols.remove_paths(stale_paths)
+
+        code_chunks = iter_code_chunks(repo_path, paths=changed, metrics=metrics)
+        mode = "incremental"
+        if metrics:
+            metrics.count("files_changed", len(changed))
+            metrics.count("files_deleted", len(deleted))
+
+    print(f"🔧 Generating embeddings for store {store_id}…")
+    cache = get_embedding_cache()
+    cache_before = cache.stats() if cache is not None else None
+    written = run_pipeline(
+        with_lexical_index(
+            iter_records(without_near_duplicates(with_symbol_index(code_chunks, symbols), dedup, metrics)),
+            lexical,
+        ),
+        # Shared per-process model, only called for text missing from the embedding cache
+        encode_with_cache,
+        collection,
+        write_batch_size=max_write_batch(client),
+        label=f"{store_id}: ",
+        on_progress=(lambda written: progress("embedding", written)) if progress else None,
+        metrics=metrics,
     )
+    if progress:
+        progress("finalizing", written)
+
+    # Representatives learn where their near-duplicates live
+    ids, metadatas = dedup.metadata_updates()
+    batch_size = max_write_batch(client)
+    for i in range(0, len(ids), batch_size):
+        collection.update(ids=ids[i:i + batch_size], metadatas=metadatas[i:i + batch_size])
+
+    with metrics.stage("save_indexes") if metrics else nullcontext():
+        lexical.save(persist_dir)
+        symbols.save(persist_dir)
+        dedup.save(persist_dir)
+
+    if head_sha:
+        with metrics.stage("commits") if metrics else nullcontext():
+            commits = index_commits(client, persist_dir, repo_path, head_sha, progress=progress)
+        if metrics:
+            metrics.count("commits", commits)
+    (persist_dir / INDEX_READY_FILE).write_text(head_sha or "")
+
+    # Next query reopens the store and sees the new chunks
+    invalidate_vectorstore(store_id)
 
-    print(f"🟢 Embeddings stored in: {persist_dir}")
\ No newline at end of file
+    print(f"🟢 {written} embeddings stored in: {persist_dir}")
+    if cache is not None:
+        print(f"📊 Embedding cache: {cache.stats()}")
+    if metrics:
+        store_bytes = dir_size(persist_dir)
+        metrics.info["mode"] = mode
+        metrics.count("store_bytes", store_bytes)
+        metrics.count("store_bytes_delta", store_bytes - store_bytes_before)
+        if cache is not None:
+            after = cache.stats()
+            metrics.count("embedding_cache_hits", after["hits"] - cache_before["hits"])
+            metrics.count("embedding_cache_misses", after["misses"] - cache_before["misses"])
+    return head_sha
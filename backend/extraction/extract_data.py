@@ -1,142 +1,394 @@
 import os
-import ast
+import multiprocessing
 import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 from dotenv import load_dotenv
-import re
+
+from extraction.javascript import LANGUAGES as JS_LANGUAGES, extract_js_functions
+from extraction.parse_cache import get_parse_cache, parse_cache_key
+from extraction.python import extract_python_functions
+from extraction.walker import RepoWalker
 
 load_dotenv()
-REPO_PATH = Path("data/repo")
 
+# Worker processes used for parsing; 1 disables the pool (handy for debugging)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1
+# Files handed to a worker per task, amortizes IPC for repos full of tiny files
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "32"))
+# Files looked up in the parse cache per query
+PARSE_CACHE_LOOKUP_BATCH = 256
+# Extraction runs next to the heartbeat and pipeline threads; forking a
+# threaded process can copy a lock some thread held (torch, sqlite3) and
+# deadlock the child, so pool processes come from a clean server process
+EXTRACTION_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# Separators in the git log format; can't appear in commit messages in practice
+COMMIT_START, FIELD, COMMIT_END = "\x1e", "\x1f", "\x1d"
+COMMIT_FORMAT = f"{COMMIT_START}%H{FIELD}%an{FIELD}%ad{FIELD}%ct{FIELD}%B{COMMIT_END}"
 
-def extract_python_functions(file_path):
+
+def is_partial_clone(repo_path) -> bool:
     """
-    Extracts Python functions & classes using AST.
+    Blobless clones fetch missing blobs on demand, so line stats (which
+    diff file contents) would download the whole history's blobs.
     """
-    chunks = []
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            source = f.read()
-
-        tree = ast.parse(source)
-        lines = source.splitlines(keepends=True)
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                start = node.lineno - 1
-                end = node.body[-1].lineno if node.body else node.lineno
-                chunk_code = "".join(lines[start:end])
-                chunks.append({
-                    "language": "python",
-                    "type": "function" if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else "class",
-                    "name": node.name,
-                    "path": str(file_path),
-                    "code": chunk_code
-                })
-    except Exception as e:
-        print(f"Error parsing {file_path}: {e}")
-    return chunks
+    result = subprocess.run(
+        ["git", "-C", str(repo_path), "config", "--get", "remote.origin.promisor"],
+        capture_output=True,
+        text=True
+    )
+    return result.stdout.strip() == "true"
 
 
-def extract_js_functions(file_path):
-    chunks = []
+def _commit_from_header(header: str) -> dict:
+    sha, author, date, timestamp, body = header.split(FIELD, 4)
+    body = body.strip()
+    return {
+        "sha": sha.strip(),
+        "author": author,
+        "date": date,
+        "timestamp": int(timestamp),
+        "subject": body.split("\n", 1)[0],
+        "message": body,
+        "files": [],
+    }
+
+
+def iter_commits(repo_path, since_sha=None, line_stats=None):
+    """
+    Streams commits newest first from `git log`, parsing its output as it is
+    produced so memory doesn't grow with history length.
+    If since_sha is given, only commits after it (since_sha..HEAD) are returned.
+    Each commit has sha, author, date, timestamp, subject, full message and files:
+    [(path, added, deleted)], with added/deleted None for binary files or
+    when line_stats is off (the default for partial clones).
+    Raises RuntimeError if git log fails, so a caller recording how far it
+    got (the commit index head) never skips history it didn't see.
+    """
+    if line_stats is None:
+        line_stats = not is_partial_clone(repo_path)
+    rev_range = [f"{since_sha}..HEAD"] if since_sha else ["HEAD"]
+    process = subprocess.Popen(
+        [
+            "git", "-C", str(repo_path), "-c", "core.quotePath=false", "log",
+            f"--format={COMMIT_FORMAT}", "--date=short", "--no-renames",
+            "--numstat" if line_stats else "--name-only",
+            *rev_range,
+        ],
+        stdout=subprocess.PIPE,
+        # A file, not a pipe: nobody reads stderr while stdout is streaming
+        stderr=(stderr := tempfile.TemporaryFile()),
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+
+    commit = None
+    header = None  # message lines of the commit being read, until COMMIT_END
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            source = f.read()
-
-        lines = source.splitlines()
-
-        # ✅ function name(...) { ... }
-        func_pattern = re.compile(
-            r'(function\s+([a-zA-Z0-9_]+)\s*\([^)]*\)\s*{)',
-            re.MULTILINE
-        )
-
-        # ✅ const name = (...) => { ... }
-        arrow_func_pattern = re.compile(
-            r'(const\s+([a-zA-Z0-9_]+)\s*=\s*\([^)]*\)\s*=>\s*{)',
-            re.MULTILINE
-        )
-
-        patterns = [(func_pattern, "function"), (arrow_func_pattern, "function")]
-
-        for pattern, type_name in patterns:
-            for match in pattern.finditer(source):
-                name = match.group(2) or "anonymous"
-                start_line = source[:match.start()].count('\n')
-                snippet = "\n".join(lines[start_line:start_line+40])  # grab 40 lines
-                chunks.append({
-                    "language": "javascript",
-                    "type": type_name,
-                    "name": name,
-                    "path": str(file_path),
-                    "code": snippet
-                })
-
-        # ✅ class ClassName { ... }
-        class_pattern = re.compile(r'class\s+([a-zA-Z0-9_]+)\s*{')
-        for match in class_pattern.finditer(source):
-            name = match.group(1)
-            start_line = source[:match.start()].count('\n')
-            snippet = "\n".join(lines[start_line:start_line+80])
-            chunks.append({
-                "language": "javascript",
-                "type": "class",
-                "name": name,
-                "path": str(file_path),
-                "code": snippet
-            })
+        for line in process.stdout:
+            if header is None and line.startswith(COMMIT_START):
+                if commit:
+                    yield commit
+                commit = None
+                header = line[len(COMMIT_START):]
+            elif header is not None:
+                header += line
+            else:
+                line = line.rstrip("\n")
+                if not line or commit is None:
+                    continue
+                if line_stats:
+                    added, deleted, path = line.split("\t", 2)
+                    commit["files"].append((
+                        path,
+                        int(added) if added.isdigit() else None,
+                        int(deleted) if deleted.isdigit() else None,
+                    ))
+                else:
+                    commit["files"].append((line, None, None))
+                continue
 
-    except Exception as e:
-        print(f"Error parsing {file_path}: {e}")
+            if COMMIT_END in header:
+                commit = _commit_from_header(header.split(COMMIT_END, 1)[0])
+                header = None
+        # All output read: a failed git log must not pass for the end of history
+        if process.wait() != 0:
+            stderr.seek(0)
+            error = stderr.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"git log {' '.join(rev_range)} failed in {repo_path}: {error[-500:]}")
+        if commit:
+            yield commit
+    finally:
+        process.stdout.close()
+        # The consumer stopped early; git may still be writing
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        stderr.close()
 
-    return chunks
 
+def is_ancestor(repo_path, sha) -> bool:
+    """
+    Whether sha is still in HEAD's history (False after a force push dropped it).
+    """
+    result = subprocess.run(
+        ["git", "-C", str(repo_path), "merge-base", "--is-ancestor", sha, "HEAD"],
+        capture_output=True,
+        text=True
+    )
+    return result.returncode == 0
 
-def extract_commits(repo_path):
+
+def get_head_sha(repo_path):
     """
-    Extracts commit history via git log.
+    Returns the commit SHA checked out in repo_path, or None if it can't be resolved.
     """
     result = subprocess.run(
-        ["git", "-C", str(repo_path), "log", "--pretty=format:%H|%ad|%s", "--date=short"],
+        ["git", "-C", str(repo_path), "rev-parse", "HEAD"],
         capture_output=True,
         text=True
     )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
 
-    commits = []
+def get_changed_files(repo_path, since_sha):
+    """
+    Diffs since_sha against HEAD.
+    Returns (changed, deleted) sets of repo-relative paths, or None when
+    since_sha is not known to the repo (e.g. after a force push).
+    Renames are reported as a delete of the old path plus an add of the new one.
+    """
+    result = subprocess.run(
+        ["git", "-C", str(repo_path), "diff", "--name-status", "--no-renames", since_sha, "HEAD"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return None
+
+    changed, deleted = set(), set()
     for line in result.stdout.splitlines():
-        parts = line.split("|", 2)
-        if len(parts) == 3:
-            sha, date, message = parts
-            commits.append({
-                "sha": sha,
-                "date": date,
-                "message": message
-            })
-    return commits
-
-
-def run_extraction(repo_path: Path):
-    repo_path = Path(repo_path)
+        status, _, path = line.partition("\t")
+        if not path:
+            continue
+        if status.startswith("D"):
+            deleted.add(path)
+        else:
+            changed.add(path)
+    return changed, deleted
 
-    if not repo_path.exists():
-        raise FileNotFoundError(f"Repo path not found: {repo_path}")
 
-    all_chunks = []
+def get_blob_shas(repo_path):
+    """
+    Maps repo-relative paths to their git blob SHA at HEAD (`git ls-tree -r`).
+    Returns {} if the tree can't be listed.
+    """
+    result = subprocess.run(
+        ["git", "-C", str(repo_path), "ls-tree", "-r", "-z", "HEAD"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return {}
+
+    blobs = {}
+    for entry in result.stdout.split("\0"):
+        info, _, path = entry.partition("\t")
+        parts = info.split()
+        if path and len(parts) == 3 and parts[1] == "blob":
+            blobs[path] = parts[2]
+    return blobs
+
+
+EXTRACTORS = {
+    ".py": extract_python_functions,
+    **{suffix: extract_js_functions for suffix in JS_LANGUAGES},
+}
+
+
+def extract_file(file_path):
+    """
+    Runs the matching extractor for one file.
+    Returns (path, chunks, error) so a bad file never takes down the run.
+    """
+    try:
+        return str(file_path), EXTRACTORS[Path(file_path).suffix](file_path), None
+    except Exception as e:
+        return str(file_path), [], f"{type(e).__name__}: {e}"
+
+
+def extract_file_batch(file_paths):
+    return [extract_file(file_path) for file_path in file_paths]
+
+
+def iter_extracted_batches(batches, workers=None):
+    """
+    Extracts batches of files across a process pool.
+    Yields one list of (path, chunks, error) per batch, in batch order; an
+    empty batch yields [] right away, which hands control back to the
+    caller. Only a bounded window of batches is in flight, so results
+    stream instead of piling up.
+    """
+    workers = workers or EXTRACTION_WORKERS
+
+    if workers <= 1:
+        for batch in batches:
+            yield extract_file_batch(batch)
+        return
+
+    context = multiprocessing.get_context(EXTRACTION_START_METHOD)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for batch in batches:
+            if not batch:
+                yield []
+                continue
+            pending.append(pool.submit(extract_file_batch, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
-    for file_path in repo_path.rglob("*.py"):
-        all_chunks.extend(extract_python_functions(file_path))
 
-    for file_path in repo_path.rglob("*.js"):
-        all_chunks.extend(extract_js_functions(file_path))
+def iter_extracted_files(files, workers=None):
+    """
+    Extracts files across a process pool.
+    Yields (path, chunks, error) in the same order as `files`.
+    `files` can be any iterable, e.g. a RepoWalker generator.
+    """
+    files = iter(files)
+    batches = iter(lambda: list(islice(files, EXTRACTION_BATCH_SIZE)), [])
+    for results in iter_extracted_batches(batches, workers=workers):
+        yield from results
+
+
+def iter_extracted_files_cached(files, repo_path: Path, workers=None, stats=None):
+    """
+    iter_extracted_files with the parse cache in front of it: files whose
+    blob was parsed before (in any repo) are served from the cache in this
+    process, and only the misses are sent to the worker pool. Parsed misses
+    are written back. Result order is deterministic but cached files may
+    come out ahead of files still being parsed.
+    stats: optional dict, receives "cached" and "parsed" file counts.
+    """
+    cache = get_parse_cache()
+    blobs = get_blob_shas(repo_path) if cache else {}
+    stats = stats if stats is not None else {}
+    stats.update(cached=0, parsed=0)
+    if not blobs:
+        for result in iter_extracted_files(files, workers=workers):
+            stats["parsed"] += 1
+            yield result
+        return
+
+    ready = deque()
+    keys = {}  # str(path) -> cache key, for misses in flight
+    to_store = []
+
+    def miss_batches():
+        """
+        Batches of cache misses for the pool. Hits go to `ready`; once a lookup
+        batch's worth is waiting, the misses found so far are handed over
+        early (even none), so the results loop gets to flush the hits and a
+        mostly cached repo is never buffered whole.
+        """
+        misses = []
+        files_iter = iter(files)
+        for batch in iter(lambda: list(islice(files_iter, PARSE_CACHE_LOOKUP_BATCH)), []):
+            batch_keys = {}
+            for path in batch:
+                blob = blobs.get(Path(path).relative_to(repo_path).as_posix())
+                if blob:
+                    batch_keys[str(path)] = parse_cache_key(blob, Path(path).suffix)
+            found = cache.get_many(list(set(batch_keys.values())))
+
+            for path in batch:
+                key = batch_keys.get(str(path))
+                if key in found:
+                    chunks = [{**chunk, "path": str(path)} for chunk in found[key]]
+                    ready.append((str(path), chunks, None))
+                    stats["cached"] += 1
+                else:
+                    if key:
+                        keys[str(path)] = key
+                    misses.append(path)
+
+            while len(misses) >= EXTRACTION_BATCH_SIZE:
+                yield misses[:EXTRACTION_BATCH_SIZE]
+                del misses[:EXTRACTION_BATCH_SIZE]
+            if len(ready) >= PARSE_CACHE_LOOKUP_BATCH:
+                yield misses
+                misses = []
+        if misses:
+            yield misses
 
-    commits = extract_commits(repo_path)
+    for results in iter_extracted_batches(miss_batches(), workers=workers):
+        while ready:
+            yield ready.popleft()
+        for path, chunks, error in results:
+            stats["parsed"] += 1
+            key = keys.pop(path, None)
+            if key and not error:
+                to_store.append((key, chunks))
+                if len(to_store) >= PARSE_CACHE_LOOKUP_BATCH:
+                    cache.put_many(to_store)
+                    to_store.clear()
+            yield path, chunks, error
+
+    while ready:
+        yield ready.popleft()
+    cache.put_many(to_store)
+
+
+def iter_code_chunks(repo_path: Path, paths=None, workers=None, metrics=None):
+    """
+    Streams code chunks from a cloned repo as files are parsed.
+    Files whose git blob was parsed before are taken from the parse cache.
+    paths: optional repo-relative file paths to restrict extraction to (incremental mode).
+    workers: extraction processes, defaults to EXTRACTION_WORKERS.
+    metrics: optional IndexMetrics, receives file and chunk counters.
+    Prints the walk / failure summary once the stream is exhausted.
+    """
+    repo_path = Path(repo_path)
+
+    if not repo_path.exists():
+        raise FileNotFoundError(f"Repo path not found: {repo_path}")
 
-    print(f"✅ Extracted {len(all_chunks)} code chunks (functions/classes)")
-    print(f"✅ Extracted {len(commits)} commits")
+    # One streaming pass over the tree; yields files in sorted order so
+    # chunk order (and anything derived from it) is reproducible
+    walker = RepoWalker(repo_path, EXTRACTORS)
+    files = walker.walk() if paths is None else walker.filter_paths(paths)
 
-    return all_chunks, commits
+    total = 0
+    failures = []
+    stats = {}
 
+    for path, chunks, error in iter_extracted_files_cached(files, repo_path, workers=workers, stats=stats):
+        if error:
+            failures.append((path, error))
+        total += len(chunks)
+        yield from chunks
 
-if __name__ == "__main__":
-    run_extraction()
+    print(f"✅ Extracted {total} code chunks (functions/classes)")
+    print(f"📂 Walked {repo_path}: {walker.summary()}")
+    print(f"🗃️ Parse cache: {stats['cached']} files reused, {stats['parsed']} parsed")
+    if metrics:
+        metrics.count("files_scanned", walker.scanned)
+        for reason, count in walker.skipped.items():
+            metrics.count(f"files_skipped_{reason}", count)
+        metrics.count("files_parse_cached", stats["cached"])
+        metrics.count("files_parsed", stats["parsed"])
+        metrics.count("files_failed", len(failures))
+        metrics.count("chunks_extracted", total)
+    if failures:
+        print(f"⚠️ Failed to parse {len(failures)} files:")
+        for path, error in failures:
+            print(f"   {path}: {error}")
@@ -0,0 +1,450 @@
+import re
+from bisect import bisect_right
+from pathlib import Path
+
+LANGUAGES = {
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+}
+
+IDENT = r"[A-Za-z_$][\w$]*"
+TYPE_PARAMS = r"(?:<[^>{;]*>)?"
+
+# function foo(...) / export default async function* foo<T>(...)
+FUNCTION_DECL = re.compile(
+    rf"^[ \t]*(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:async\s+)?function\b\s*\*?\s*({IDENT})?\s*{TYPE_PARAMS}\s*\(",
+    re.MULTILINE,
+)
+
+# const foo = (...) => / export const foo: Handler = async x => / let foo = function (...)
+VARIABLE_FUNC = re.compile(
+    rf"^[ \t]*(?:export\s+)?(?:const|let|var)\s+({IDENT})\s*(?::[^=\n]+)?=\s*(?:async\s+)?"
+    rf"(?:function\b\s*\*?\s*(?:{IDENT})?\s*{TYPE_PARAMS}\s*(\()|{TYPE_PARAMS}\s*(\()|({IDENT})\s*=>)",
+    re.MULTILINE,
+)
+
+# class Foo extends Bar implements Baz {   (also TS interfaces / enums)
+CLASS_DECL = re.compile(
+    rf"^[ \t]*(?:export\s+(?:default\s+)?)?(?:declare\s+)?(?:abstract\s+)?(class|interface|enum)\s+({IDENT})[^{{;]*\{{",
+    re.MULTILINE,
+)
+
+# Class members: foo(...) {, static async *foo<T>(...): T {, get foo() {, #priv() {
+METHOD_DECL = re.compile(
+    rf"^[ \t]*(?:@{IDENT}(?:\([^)]*\))?\s+)*"
+    rf"(?:(?:public|private|protected|static|readonly|async|override|abstract|get|set)\s+)*\*?\s*"
+    rf"(#?{IDENT})\s*\??\s*{TYPE_PARAMS}\s*\(",
+    re.MULTILINE,
+)
+
+# Class fields holding arrow functions: handleClick = async (e) => {
+FIELD_ARROW = re.compile(
+    rf"^[ \t]*(?:(?:public|private|protected|static|readonly)\s+)*(#?{IDENT})\s*(?::[^=\n]+)?=\s*(?:async\s+)?"
+    rf"(?:{TYPE_PARAMS}\s*(\()|({IDENT})\s*=>)",
+    re.MULTILINE,
+)
+
+NOT_METHODS = {"if", "for", "while", "switch", "catch", "function", "return", "with", "super"}
+
+# Characters after which a "/" starts a regex literal rather than a division
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+REGEX_KEYWORDS = ("return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "yield", "await")
+
+
+class SourceIndex:
+    """
+    One linear pass over a JS/TS source.
+
+    Builds the line-offset table, the matching position of every (), [] and {}
+    that lives in code, and the spans of strings / comments / regex literals,
+    so declaration matches can be resolved to exact line ranges without
+    re-scanning the file.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.line_starts = [0]
+        self.pairs = {}
+        self.skip_starts = []
+        self.skip_ends = []
+        self._scan()
+        self.opens = sorted(i for i in self.pairs if source[i] == "{")
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number of a character offset."""
+        return bisect_right(self.line_starts, offset)
+
+    def in_skipped(self, offset: int) -> bool:
+        """True if offset falls inside a string, comment or regex literal."""
+        i = bisect_right(self.skip_starts, offset) - 1
+        return i >= 0 and offset < self.skip_ends[i]
+
+    def _skip(self, start: int, end: int):
+        self.skip_starts.append(start)
+        self.skip_ends.append(end)
+
+    def _scan(self):
+        src = self.source
+        n = len(src)
+        stack = []  # open bracket positions; -1 marks a template literal ${ ... }
+        last_sig = ""  # last significant code character, to tell regexes from division
+        last_word = ""
+        i = 0
+
+        def scan_template(i):
+            # i is just past the opening backtick (or the closing } of a ${ }).
+            # Returns (position, True) when a ${ opens, or (position, False) at the end.
+            while i < n:
+                c = src[i]
+                if c == "\\":
+                    if src.startswith("\n", i + 1):
+                        self.line_starts.append(i + 2)
+                    i += 2
+                    continue
+                if c == "\n":
+                    self.line_starts.append(i + 1)
+                elif c == "`":
+                    return i + 1, False
+                elif c == "$" and i + 1 < n and src[i + 1] == "{":
+                    return i + 2, True
+                i += 1
+            return n, False
+
+        while i < n:
+            c = src[i]
+
+            if c == "\n":
+                self.line_starts.append(i + 1)
+                i += 1
+                continue
+            if c in " \t\r":
+                i += 1
+                continue
+
+            if c == "/" and i + 1 < n and src[i + 1] == "/":
+                end = src.find("\n", i)
+                end = n if end == -1 else end
+                self._skip(i, end)
+                i = end
+                continue
+
+            if c == "/" and i + 1 < n and src[i + 1] == "*":
+                end = src.find("*/", i + 2)
+                end = n if end == -1 else end + 2
+                for j in range(i, end):
+                    if src[j] == "\n":
+                        self.line_starts.append(j + 1)
+                self._skip(i, end)
+                i = end
+                last_sig = ""
+                continue
+
+            if c in "'\"":
+                # Quoted strings can't span lines; stopping at \n also keeps
+                # apostrophes in JSX text from swallowing the rest of the file
+                j = i + 1
+                while j < n and src[j] != c and src[j] != "\n":
+                    if src[j] == "\\" and src.startswith("\n", j + 1):
+                        self.line_starts.append(j + 2)
+                    j += 2 if src[j] == "\\" else 1
+                end = min(j + 1, n) if j < n and src[j] == c else j
+                self._skip(i, end)
+                i = end
+                last_sig = c
+                continue
+
+            if c == "`":
+                start = i
+                i, opened = scan_template(i + 1)
+                self._skip(start, i)
+                if opened:
+                    stack.append(-1)
+                last_sig = "`"
+                continue
+
+            if c == "/" and (last_sig == "" or last_sig in REGEX_PRECEDERS or last_word in REGEX_KEYWORDS):
+                j = i + 1
+                in_class = False
+                while j < n and src[j] != "\n":
+                    ch = src[j]
+                    if ch == "\\":
+                        j += 2
+                        continue
+                    if ch == "[":
+                        in_class = True
+                    elif ch == "]":
+                        in_class = False
+                    elif ch == "/" and not in_class:
+                        break
+                    j += 1
+                if j < n and src[j] == "/":
+                    j += 1
+                    while j < n and src[j].isalpha():
+                        j += 1
+                    self._skip(i, j)
+                    i = j
+                    last_sig = "/"
+                    last_word = ""
+                    continue
+
+            if c in "([{":
+                stack.append(i)
+            elif c in ")]}":
+                if stack:
+                    open_pos = stack.pop()
+                    if open_pos == -1:
+                        # End of a ${ } placeholder: resume the template literal
+                        start = i
+                        i, opened = scan_template(i + 1)
+                        self._skip(start, i)
+                        if opened:
+                            stack.append(-1)
+                        last_sig = "`"
+                        continue
+                    self.pairs[open_pos] = i
+
+            if c.isalnum() or c in "_$":
+                j = i + 1
+                while j < n and (src[j].isalnum() or src[j] in "_$"):
+                    j += 1
+                last_word = src[i:j]
+                last_sig = "a"
+                i = j
+                continue
+
+            last_sig = c
+            last_word = ""
+            i += 1
+
+    def skip_ws(self, i: int) -> int:
+        src = self.source
+        while i < len(src) and (src[i].isspace() or self.in_skipped(i)):
+            i += 1
+        return i
+
+    def body_after_params(self, paren: int):
+        """
+        Given the "(" of a parameter list, returns the (start, end) offsets of the
+        function body: a {...} block, or an arrow expression up to the end of
+        the statement. Returns None for bodiless declarations (TS overloads,
+        `declare function`) or when the parameter list is unbalanced.
+        """
+        src = self.source
+        close = self.pairs.get(paren)
+        if close is None:
+            return None
+
+        i = self.skip_ws(close + 1)
+        if i < len(src) and src[i] == ":":
+            i = self.skip_type(i + 1)
+        return self.body_from(i)
+
+    def skip_type(self, i: int) -> int:
+        """
+        Skips a TS return type annotation, stopping at the body's "{" or "=>".
+        Only a "{" or "=>" outside <...> counts, and object-literal types are
+        jumped over whole where a type is expected (at the start, after | or &),
+        so these all end at the body:
+            Promise<{ a: string }>    { a: 1 } | { b: 2 }    Promise<() => void>
+        """
+        src = self.source
+        n = len(src)
+        i = self.skip_ws(i)
+        depth = 0  # open < of generic arguments
+        type_expected = True
+        while i < n:
+            if self.in_skipped(i):
+                i = self.skip_ends[bisect_right(self.skip_starts, i) - 1]
+                continue
+            c = src[i]
+            if c.isspace():
+                i += 1
+                continue
+            if c in "([" and i in self.pairs:
+                i = self.pairs[i] + 1
+                type_expected = False
+                continue
+            if c == "{" and (depth or type_expected) and i in self.pairs:
+                i = self.pairs[i] + 1
+                type_expected = False
+                continue
+            if src.startswith("=>", i):
+                if not depth:
+                    break
+                i += 2
+                type_expected = True
+                continue
+            if not depth and c in "{;":
+                break
+            if c == "<":
+                depth += 1
+            elif c == ">" and depth:
+                depth -= 1
+            type_expected = c in "|&<,:"
+            i += 1
+        return i
+
+    def body_from(self, i: int):
+        """
+        Resolves the body that must start at i: "{ ... }" or "=> expr".
+        """
+        src = self.source
+        n = len(src)
+        i = self.skip_ws(i)
+
+        if src.startswith("=>", i):
+            i = self.skip_ws(i + 2)
+            if i < n and src[i] == "{" and i in self.pairs:
+                return i, self.pairs[i]
+            return i, self.expression_end(i)
+        if i < n and src[i] == "{" and i in self.pairs:
+            return i, self.pairs[i]
+        return None
+
+    def expression_end(self, i: int) -> int:
+        """
+        End of an arrow-function expression body: the first ; , or unmatched
+        closing bracket at depth zero, or a newline that doesn't continue the
+        expression.
+        """
+        src = self.source
+        n = len(src)
+        seen_token = False
+        while i < n:
+            if self.in_skipped(i):
+                i = self.skip_ends[bisect_right(self.skip_starts, i) - 1]
+                seen_token = True
+                continue
+            c = src[i]
+            if c in "([{" and i in self.pairs:
+                i = self.pairs[i] + 1
+                seen_token = True
+                continue
+            if c in ";,)]}":
+                return i - 1
+            if c == "\n" and seen_token:
+                nxt = self.skip_ws(i)
+                if nxt >= n or src[nxt] not in ".?:+-*/&|=<>":
+                    return i - 1
+            if not c.isspace():
+                seen_token = True
+            i += 1
+        return n - 1
+
+    def top_level_ranges(self, open_pos: int):
+        """
+        Brace blocks nested directly inside the block opened at open_pos.
+        """
+        close = self.pairs[open_pos]
+        ranges = []
+        k = bisect_right(self.opens, open_pos)
+        while k < len(self.opens) and self.opens[k] < close:
+            inner = self.opens[k]
+            inner_close = self.pairs[inner]
+            ranges.append((inner, inner_close))
+            k = bisect_right(self.opens, inner_close)
+        return ranges
+
+
+def _chunk(file_path, language, type_name, name, index, lines, start, end, parent=None):
+    start_line = index.line_of(start)
+    end_line = index.line_of(end)
+    chunk = {
+        "language": language,
+        "type": type_name,
+        "name": name,
+        "path": str(file_path),
+        "code": "\n".join(lines[start_line - 1:end_line]),
+        "start_line": start_line,
+        "end_line": end_line,
+    }
+    if parent:
+        chunk["parent"] = parent
+    return chunk
+
+
+def extract_js_functions(file_path):
+    """
+    Extracts functions, arrow functions, classes and class methods from
+    .js/.jsx/.ts/.tsx files with exact start/end lines.
+    Functions nested inside an already extracted function are not re-emitted.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    language = LANGUAGES.get(Path(file_path).suffix, "javascript")
+    index = SourceIndex(source)
+    # Lines as line_of counts them; str.splitlines would also break on \x0c, \x85, \u2028...
+    lines = source.split("\n")
+
+    found = []  # (start, end, type, name, parent)
+    class_bodies = []
+
+    for match in CLASS_DECL.finditer(source):
+        brace = match.end() - 1
+        if index.in_skipped(match.start(2)) or brace not in index.pairs:
+            continue
+        kind = "class" if match.group(1) == "class" else match.group(1)
+        found.append((match.start(), index.pairs[brace], kind, match.group(2), None))
+        if kind == "class":
+            class_bodies.append((brace, match.group(2)))
+
+    for match in FUNCTION_DECL.finditer(source):
+        if index.in_skipped(match.end() - 1):
+            continue
+        body = index.body_after_params(match.end() - 1)
+        if body:
+            found.append((match.start(), body[1], "function", match.group(1) or "default", None))
+
+    for match in VARIABLE_FUNC.finditer(source):
+        if index.in_skipped(match.start(1)):
+            continue
+        paren = match.start(2) if match.group(2) else match.start(3) if match.group(3) else None
+        body = index.body_after_params(paren) if paren is not None else index.body_from(match.end(4))
+        if body:
+            found.append((match.start(), body[1], "function", match.group(1), None))
+
+    # Class members are only matched at the top level of each class body
+    for brace, class_name in class_bodies:
+        close = index.pairs[brace]
+        nested = index.top_level_ranges(brace)
+        nested_starts = [r[0] for r in nested]
+        body_text = source[brace + 1:close]
+
+        for pattern in (METHOD_DECL, FIELD_ARROW):
+            for match in pattern.finditer(body_text):
+                start = brace + 1 + match.start(1)
+                k = bisect_right(nested_starts, start) - 1
+                if (k >= 0 and start < nested[k][1]) or index.in_skipped(start):
+                    continue
+                name = match.group(1)
+                if name in NOT_METHODS:
+                    continue
+                if pattern is METHOD_DECL:
+                    body = index.body_after_params(brace + match.end())
+                else:
+                    paren = match.start(2) if match.group(2) else None
+                    body = index.body_after_params(brace + 1 + paren) if paren is not None \
+                        else index.body_from(brace + 1 + match.end(3))
+                if body and body[1] <= close:
+                    found.append((brace + 1 + match.start(), body[1], "method", name, class_name))
+
+    # Outer definitions first; drop functions nested in an emitted function or method
+    found.sort(key=lambda f: (f[0], -f[1]))
+    chunks = []
+    covered_until = -1
+    for start, end, type_name, name, parent in found:
+        if type_name in ("function", "method") and start < covered_until:
+            continue
+        # Skip leading whitespace so start_line points at the declaration itself
+        while start < len(source) and source[start] in " \t\r\n":
+            start += 1
+        chunks.append(_chunk(file_path, language, type_name, name, index, lines, start, end, parent))
+        if type_name in ("function", "method"):
+            covered_until = max(covered_until, end)
+
+    return chunks
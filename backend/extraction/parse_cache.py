@@ -0,0 +1,55 @@
+import os
+import json
+import zlib
+from dotenv import load_dotenv
+
+from extraction.python import PYTHON_CHUNK_MAX_LINES
+from sqlite_lru import SQLiteLRUCache, process_singleton
+
+load_dotenv()
+
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "1") == "1"
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "data/parse_cache.sqlite")
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "1000000"))
+
+# Bump by hand whenever a change to python.py or javascript.py alters the
+# chunks some file yields (boundaries, names, line numbers, code), so cached
+# chunks (and indexes, see PIPELINE_VERSION) never outlive the code that made
+# them. Refactors that keep the output identical leave it alone.
+PARSER_VERSION = f"4:py{PYTHON_CHUNK_MAX_LINES}"
+
+
+def parse_cache_key(blob_sha: str, suffix: str) -> str:
+    """
+    The same blob can be parsed differently depending on its extension (.js vs .ts).
+    """
+    return f"{blob_sha}{suffix}"
+
+
+class ParseCache(SQLiteLRUCache):
+    """
+    On-disk cache from git blob SHA to the chunks extracted from that blob.
+
+    Chunks are stored without their path (the same blob appears at different
+    paths, in different clones) as zlib-compressed JSON. Only entries written
+    by this PARSER_VERSION are read; all of them are evicted
+    least-recently-used past max_entries.
+    """
+
+    table = "parsed_blobs"
+    value_column = "chunks"
+    version = PARSER_VERSION
+
+    def __init__(self, path: str = PARSE_CACHE_PATH, max_entries: int = PARSE_CACHE_MAX_ENTRIES):
+        super().__init__(path, max_entries)
+
+    def encode_value(self, chunks) -> bytes:
+        # Chunks have no "path" once cached; get_many's caller fills it in
+        stripped = [{k: v for k, v in chunk.items() if k != "path"} for chunk in chunks]
+        return zlib.compress(json.dumps(stripped, separators=(",", ":")).encode("utf-8"))
+
+    def decode_value(self, blob: bytes):
+        return json.loads(zlib.decompress(blob))
+
+
+get_parse_cache = process_singleton(ParseCache, PARSE_CACHE_ENABLED)
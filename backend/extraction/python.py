@@ -0,0 +1,178 @@
+import io
+import os
+import ast
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Functions longer than this are split into several chunks at statement boundaries
+PYTHON_CHUNK_MAX_LINES = int(os.getenv("PYTHON_CHUNK_MAX_LINES", "150"))
+# Class-level statements longer than this show only their first line in the outline
+OUTLINE_STATEMENT_LINES = 3
+
+FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def _first_line(node) -> int:
+    """
+    Definition start including decorators (they matter for retrieval, e.g. routes).
+    """
+    return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+
+def _docstring_node(node):
+    if node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant) \
+            and isinstance(node.body[0].value.value, str):
+        return node.body[0]
+    return None
+
+
+def _inline_body(node, lines) -> bool:
+    """
+    Whether the body starts on the header line: `def z(self): pass`.
+    """
+    first = node.body[0]
+    # col_offset counts UTF-8 bytes
+    return bool(lines[first.lineno - 1].encode("utf-8")[:first.col_offset].strip())
+
+
+def _header_end(node, lines) -> int:
+    """
+    Last line of the `def`/`class` header (signatures can span several lines).
+    """
+    if _inline_body(node, lines):
+        return node.body[0].lineno
+    return _first_line(node.body[0]) - 1
+
+
+def _chunk(file_path, type_name, name, lines, start, end, parent=None, code=None):
+    chunk = {
+        "language": "python",
+        "type": type_name,
+        "name": name,
+        "path": str(file_path),
+        "code": code if code is not None else "".join(lines[start - 1:end]),
+        "start_line": start,
+        "end_line": end,
+    }
+    if parent:
+        chunk["parent"] = parent
+    return chunk
+
+
+def _function_chunks(file_path, node, lines, parent=None, max_lines=PYTHON_CHUNK_MAX_LINES):
+    """
+    One chunk per function, or several consecutive parts when it's longer than
+    max_lines. Parts break between top-level statements of the body, so the
+    first part keeps the signature and docstring, and only a single statement
+    longer than max_lines makes a part exceed it. Each part records its
+    number and the full definition's end line.
+    """
+    type_name = "method" if parent else "function"
+    start, end = _first_line(node), node.end_lineno
+    if end - start + 1 <= max_lines:
+        return [_chunk(file_path, type_name, node.name, lines, start, end, parent)]
+
+    boundaries = [start]
+    for stmt in node.body[1:]:
+        stmt_start = _first_line(stmt)
+        # Start a new part before this statement if it would push the current one over the limit
+        if stmt.end_lineno - boundaries[-1] + 1 > max_lines and stmt_start > boundaries[-1]:
+            boundaries.append(stmt_start)
+    if len(boundaries) == 1:
+        return [_chunk(file_path, type_name, node.name, lines, start, end, parent)]
+
+    chunks = []
+    for i, part_start in enumerate(boundaries):
+        part_end = boundaries[i + 1] - 1 if i + 1 < len(boundaries) else end
+        chunk = _chunk(file_path, type_name, node.name, lines, part_start, part_end, parent)
+        chunk["part"] = i + 1
+        chunk["def_end_line"] = end
+        chunks.append(chunk)
+    return chunks
+
+
+def _outline(node, lines) -> str:
+    """
+    The class without its method bodies: header, docstring, class attributes,
+    and each method's signature and docstring.
+    """
+    out = lines[_first_line(node) - 1:_header_end(node, lines)]
+    docstring = _docstring_node(node)
+    if docstring:
+        out += lines[docstring.lineno - 1:docstring.end_lineno]
+
+    for stmt in node.body:
+        if stmt is docstring:
+            continue
+        if isinstance(stmt, FUNCTIONS + (ast.ClassDef,)):
+            out += lines[_first_line(stmt) - 1:_header_end(stmt, lines)]
+            if _inline_body(stmt, lines):
+                continue  # the whole definition is on that line
+            inner_doc = _docstring_node(stmt)
+            if inner_doc:
+                out += lines[inner_doc.lineno - 1:inner_doc.end_lineno]
+            out.append(" " * (stmt.col_offset + 4) + "...\n")
+        elif stmt.lineno <= _header_end(node, lines):
+            continue  # `class A: x = 1` is already on the header line
+        elif stmt.end_lineno - stmt.lineno < OUTLINE_STATEMENT_LINES:
+            out += lines[stmt.lineno - 1:stmt.end_lineno]
+        else:
+            out.append(lines[stmt.lineno - 1].rstrip("\n") + " ...\n")
+    return "".join(out)
+
+
+def _class_chunks(file_path, node, lines, parent=None):
+    members = [stmt for stmt in node.body if isinstance(stmt, FUNCTIONS + (ast.ClassDef,))]
+    outline = _chunk(
+        file_path, "class", node.name, lines, _first_line(node), node.end_lineno, parent, code=_outline(node, lines)
+    )
+    outline["outline"] = True
+    if members:
+        outline["children"] = ",".join(member.name for member in members)
+
+    chunks = [outline]
+    for member in members:
+        if isinstance(member, ast.ClassDef):
+            chunks.extend(_class_chunks(file_path, member, lines, parent=node.name))
+        else:
+            chunks.extend(_function_chunks(file_path, member, lines, parent=node.name))
+    return chunks
+
+
+def _walk(file_path, body, lines):
+    """
+    Module-level definitions, also inside top-level if/try blocks
+    (`if TYPE_CHECKING:`, optional-import fallbacks). Functions and classes
+    nested in a function stay part of that function's chunk.
+    """
+    chunks = []
+    for node in body:
+        if isinstance(node, FUNCTIONS):
+            chunks.extend(_function_chunks(file_path, node, lines))
+        elif isinstance(node, ast.ClassDef):
+            chunks.extend(_class_chunks(file_path, node, lines))
+        elif isinstance(node, (ast.If, ast.Try)):
+            for block in (node.body, node.orelse, getattr(node, "finalbody", []),
+                          *[handler.body for handler in getattr(node, "handlers", [])]):
+                chunks.extend(_walk(file_path, block, lines))
+    return chunks
+
+
+def extract_python_functions(file_path):
+    """
+    Extracts Python functions & classes using AST, without overlap:
+    - a class becomes an outline chunk (signatures + docstrings, no method bodies)
+      linked to its methods through `children`
+    - each method is its own chunk with `parent` set to the class
+    - functions longer than PYTHON_CHUNK_MAX_LINES are split into parts
+    Line ranges are exact (decorators included, end_lineno).
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        source = f.read()
+
+    tree = ast.parse(source)
+    # Only "\n" ends a line for ast (open() already turned \r\n and \r into it);
+    # str.splitlines would also break on \x0c, \x1c-\x1e, \x85, \u2028 and shift every line after
+    lines = io.StringIO(source).readlines()
+    return _walk(file_path, tree.body, lines)
@@ -0,0 +1,248 @@
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+# Always skipped, on top of the repo's own .gitignore files (gitignore syntax)
+DEFAULT_IGNORES = [
+    ".git/",
+    "node_modules/",
+    "bower_components/",
+    "dist/",
+    "build/",
+    "out/",
+    ".next/",
+    "coverage/",
+    "vendor/",
+    "third_party/",
+    "__pycache__/",
+    ".venv/",
+    "venv/",
+    "site-packages/",
+    "*.min.js",
+    "*.bundle.js",
+    "*.chunk.js",
+    "*-bundle.js",
+    "*_pb2.py",
+]
+
+# Extra comma-separated patterns, e.g. EXTRACTION_IGNORE="legacy/,*.generated.js"
+EXTRA_IGNORES = [p.strip() for p in os.getenv("EXTRACTION_IGNORE", "").split(",") if p.strip()]
+
+MAX_FILE_BYTES = int(os.getenv("EXTRACTION_MAX_FILE_BYTES", str(512 * 1024)))
+# Lines longer than this in the file header mean minified / machine-written code
+MAX_LINE_LENGTH = int(os.getenv("EXTRACTION_MAX_LINE_LENGTH", "1000"))
+SNIFF_BYTES = 8192
+
+GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"Code generated by", b"auto-generated")
+
+
+def _pattern_to_regex(pattern: str) -> str:
+    """
+    Translates one gitignore glob (already stripped of !, leading and trailing /) to a regex.
+    """
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def compile_ignore_rules(lines):
+    """
+    Parses gitignore lines into (regex, negated, dir_only) rules.
+    Patterns without a slash match at any depth, like git does.
+    """
+    rules = []
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            continue
+
+        regex = _pattern_to_regex(line)
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        rules.append((re.compile(regex + "$"), negated, dir_only))
+    return rules
+
+
+class RepoWalker:
+    """
+    Single-pass, streaming walk over a repo.
+
+    Honors nested .gitignore files plus DEFAULT_IGNORES / EXTRACTION_IGNORE,
+    only yields files with a supported suffix, and skips oversized, binary,
+    generated and minified files without reading more than SNIFF_BYTES.
+    Skip reasons are tallied in `self.skipped`.
+    """
+
+    def __init__(self, root, suffixes, extra_ignores=None):
+        self.root = Path(root)
+        self.suffixes = set(suffixes)
+        self.base_rules = compile_ignore_rules(DEFAULT_IGNORES + EXTRA_IGNORES + list(extra_ignores or []))
+        self.skipped = Counter()
+        self.scanned = 0
+        self._dir_rules = {}
+
+    def _rules_for(self, rel_dir: str):
+        """
+        .gitignore rules declared in rel_dir ("" for the repo root), cached per directory.
+        """
+        if rel_dir not in self._dir_rules:
+            gitignore = self.root / rel_dir / ".gitignore"
+            try:
+                with open(gitignore, "r", encoding="utf-8", errors="ignore") as f:
+                    self._dir_rules[rel_dir] = compile_ignore_rules(f)
+            except OSError:
+                self._dir_rules[rel_dir] = []
+        return self._dir_rules[rel_dir]
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Last matching rule wins; deeper .gitignore files override shallower ones.
+        """
+        ignored = False
+        scopes = [("", self.base_rules)]
+
+        parts = rel_path.split("/")
+        for depth in range(len(parts)):
+            rel_dir = "/".join(parts[:depth])
+            scopes.append((rel_dir, self._rules_for(rel_dir)))
+
+        for rel_dir, rules in scopes:
+            local = rel_path[len(rel_dir) + 1:] if rel_dir else rel_path
+            for regex, negated, dir_only in rules:
+                if dir_only and not is_dir:
+                    continue
+                if regex.match(local):
+                    ignored = not negated
+        return ignored
+
+    def skip_reason(self, path: Path, size: int):
+        """
+        Cheap content checks: size from stat, then a small header sniff.
+        """
+        if size > MAX_FILE_BYTES:
+            return "too_large"
+        if size == 0:
+            return "empty"
+
+        try:
+            with open(path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError:
+            return "unreadable"
+
+        if b"\0" in head:
+            return "binary"
+        if any(marker in head[:1024] for marker in GENERATED_MARKERS):
+            return "generated"
+        if any(len(line) > MAX_LINE_LENGTH for line in head.splitlines()):
+            return "minified"
+        return None
+
+    def walk(self):
+        """
+        Yields extractable files in a deterministic (sorted) order.
+        Ignored directories are pruned, never descended into.
+        """
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            rel_dir = os.path.relpath(dirpath, self.root)
+            rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+
+            kept = []
+            for name in sorted(dirnames):
+                rel = f"{rel_dir}/{name}" if rel_dir else name
+                if self.is_ignored(rel, is_dir=True):
+                    self.skipped["ignored_dir"] += 1
+                else:
+                    kept.append(name)
+            dirnames[:] = kept
+
+            for name in sorted(filenames):
+                rel = f"{rel_dir}/{name}" if rel_dir else name
+                path = self.root / rel
+                if self.accept(rel, path):
+                    yield path
+
+    def filter_paths(self, rel_paths):
+        """
+        Applies the same rules to an explicit list of repo-relative paths (incremental mode).
+        """
+        for rel in sorted(rel_paths):
+            path = self.root / rel
+            if not path.is_file():
+                continue
+            parents = rel.split("/")[:-1]
+            if any(self.is_ignored("/".join(parents[:i + 1]), is_dir=True) for i in range(len(parents))):
+                self.skipped["ignored"] += 1
+                continue
+            if self.accept(rel, path):
+                yield path
+
+    def accept(self, rel: str, path: Path) -> bool:
+        if path.suffix not in self.suffixes:
+            self.skipped["unsupported"] += 1
+            return False
+        if self.is_ignored(rel, is_dir=False):
+            self.skipped["ignored"] += 1
+            return False
+        try:
+            size = path.stat().st_size
+        except OSError:
+            self.skipped["unreadable"] += 1
+            return False
+
+        reason = self.skip_reason(path, size)
+        if reason:
+            self.skipped[reason] += 1
+            return False
+
+        self.scanned += 1
+        return True
+
+    def summary(self) -> str:
+        skipped = ", ".join(f"{reason}={count}" for reason, count in sorted(self.skipped.items()))
+        return f"{self.scanned} files to extract, skipped: {skipped or 'none'}"
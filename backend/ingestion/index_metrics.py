@@ -0,0 +1,112 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets this process's peak RSS counter (Linux only), so a long-lived
+    worker reports the peak of the current run rather than of its lifetime.
+    """
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Peak resident memory of this process in MB (extraction worker processes not included).
+    """
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def dir_size(path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class IndexMetrics:
+    """
+    Timings and counters for one index_repository run.
+
+    Stages are timed with `with metrics.stage("clone"):` or add_time() for
+    work spread over many calls. Pipeline stages (extract, embed, write) run
+    concurrently, so their seconds overlap and can add up to more than the
+    total. Safe to update from the pipeline threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+        self.info = {}
+        self.peak_rss_reset = reset_peak_rss()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.seconds[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def report(self) -> dict:
+        """
+        JSON-serializable summary, stored per run (see repositories.model.IndexRun).
+        """
+        total = time.perf_counter() - self.started
+        embed_seconds = self.seconds.get("embed", 0.0)
+        return {
+            **self.info,
+            "total_seconds": round(total, 3),
+            "stages": {
+                name: {"seconds": round(seconds, 3), "calls": self.calls[name]}
+                for name, seconds in self.seconds.items()
+            },
+            "counters": dict(self.counters),
+            "tokens_estimated": self.counters.get("document_chars", 0) // 4,
+            "embeddings_per_second": (
+                round(self.counters.get("embedded", 0) / embed_seconds, 1) if embed_seconds else None
+            ),
+            "records_per_second": round(self.counters.get("records_written", 0) / total, 1) if total else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_is_per_run": self.peak_rss_reset,
+        }
@@ -1,32 +1,90 @@
+import json
+from datetime import datetime
 from database import SessionLocal
-from repositories.model import Repository
-from ingestion.clone_repo import clone_specific_repo
+from repositories.model import IndexRun, Repository
+from ingestion.clone_repo import checkout_repo, mirror_in_use
+from ingestion.index_metrics import IndexMetrics
+from ingestion.shared_index import build_lock, checkout_path, get_or_create_index, mark_indexed
 from embeddings.store_embeddings import create_vector_store
 
-def index_repository(repo_id: int):
+
+def save_index_run(db, repo_id: int, started_at, metrics: IndexMetrics, status: str, head_sha=None, error=None):
+    report = metrics.report()
+    db.add(IndexRun(
+        repo_id=repo_id,
+        status=status,
+        mode=report.get("mode"),
+        head_sha=head_sha,
+        stats=json.dumps(report),
+        error=error,
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+    ))
+
+    stages = ", ".join(f"{name} {s['seconds']}s" for name, s in report["stages"].items())
+    print(f"⏱️ Repo {repo_id} {status} in {report['total_seconds']}s ({stages}), peak RSS {report['peak_rss_mb']} MB")
+
+
+def index_repository(repo_id: int, progress=None):
     """
     SINGLE SOURCE OF TRUTH FOR INDEXING
-    Safe to call from anywhere.
+    Safe to call from anywhere; normally run by the job worker (jobs/worker.py).
+    progress: optional callback(stage, items_done=None); it may raise to abort.
+    Errors are re-raised after rollback so the caller can retry.
+    Every run, failed or not, is recorded as an IndexRun with its timings.
+
+    The index is shared by every user of the repo (see ingestion/shared_index.py):
+    a run updates it from the commit it was last built at, and a run queued
+    while another one builds the same index waits, then finds it current.
     """
+    report = progress or (lambda stage, items_done=None: None)
+    metrics = IndexMetrics()
+    started_at = datetime.utcnow()
 
     db = SessionLocal()
+    repo = None
 
     try:
         repo = db.query(Repository).filter(Repository.id == repo_id).first()
         if not repo:
             return
 
-        local_path = f"data/repos/{repo.id}"
+        local_path = checkout_path(repo.full_name)
 
-        clone_specific_repo(repo.full_name, local_path)
-        create_vector_store(repo_id=repo.id, repo_path=local_path)
+        with mirror_in_use(repo.full_name):
+            report("waiting")
+            index = get_or_create_index(db, repo.full_name)
+            with build_lock(index.store_id):
+                # Another run may have updated (or garbage-collected) the index meanwhile
+                index = get_or_create_index(db, repo.full_name)
+                db.refresh(index)
+                report("cloning")
+                with metrics.stage("clone"):
+                    checkout_repo(repo.full_name, local_path)
+                report("indexing")
+                head_sha = create_vector_store(
+                    store_id=index.store_id,
+                    repo_path=local_path,
+                    last_indexed_sha=index.commit_sha,
+                    progress=progress,
+                    metrics=metrics,
+                )
 
-        repo.indexed = True
-        db.commit()
+                mark_indexed(db, index, head_sha)
+                save_index_run(db, repo.id, started_at, metrics, "succeeded", head_sha=head_sha)
+                db.commit()
 
     except Exception as e:
         print(f"❌ Indexing failed: {e}")
         db.rollback()
+        if repo is not None:
+            try:
+                save_index_run(db, repo.id, started_at, metrics, "failed", error=f"{type(e).__name__}: {e}")
+                db.commit()
+            except Exception as record_error:
+                print(f"⚠️ Could not record failed index run: {record_error}")
+                db.rollback()
+        raise
 
     finally:
         db.close()
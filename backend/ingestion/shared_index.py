@@ -0,0 +1,191 @@
+from datetime import datetime
+from pathlib import Path
+import requests
+from sqlalchemy.exc import IntegrityError
+
+from ingestion.clone_repo import file_lock, remove_tree
+from jobs.model import IndexJob
+from jobs.service import ACTIVE_STATUSES, enqueue_index_job
+from repositories.model import RepoIndex, Repository
+from retrieval.vectorstore_pool import (
+    PIPELINE_VERSION,
+    VECTOR_BASE_DIR,
+    indexed_sha,
+    invalidate_vectorstore,
+    shared_store_id,
+    vectorstore_path,
+)
+
+
+def checkout_path(full_name: str) -> str:
+    """
+    Worktree every index run of full_name reads from. Chunk paths start
+    with it, so it must not depend on which user's repo triggered the run.
+    """
+    return f"data/repos/{full_name.replace('/', '__')}"
+
+
+def build_lock(store_id: str):
+    """
+    Held while a store is being written or deleted, one index run at a time.
+    """
+    return file_lock(f"{store_id}.build")
+
+
+def get_or_create_index(db, full_name: str) -> RepoIndex:
+    store_id = shared_store_id(full_name)
+    index = db.query(RepoIndex).filter(RepoIndex.store_id == store_id).first()
+    if index is not None:
+        return index
+
+    db.add(RepoIndex(store_id=store_id, full_name=full_name, pipeline_version=PIPELINE_VERSION))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Created by a concurrent run
+        db.rollback()
+    return db.query(RepoIndex).filter(RepoIndex.store_id == store_id).first()
+
+
+def ready_index(db, full_name: str) -> RepoIndex | None:
+    """
+    The shared index of full_name at the current pipeline version, if a build of it finished.
+    """
+    index = db.query(RepoIndex).filter(RepoIndex.store_id == shared_store_id(full_name)).first()
+    if index is None or index.commit_sha is None or indexed_sha(index.store_id) is None:
+        return None
+    return index
+
+
+def index_refcount(db, index: RepoIndex) -> int:
+    return db.query(Repository).filter(Repository.full_name == index.full_name).count()
+
+
+def github_head_sha(full_name: str, token: str) -> str:
+    """
+    Latest commit of the repo's default branch, as seen with the user's token.
+    Doubles as the access check before a user is attached to a shared index,
+    so it fails closed: raises PermissionError when GitHub refuses the token
+    or the repo (401/403/404), ConnectionError for any other outcome
+    (network error, rate limit, GitHub outage, no commit returned).
+    """
+    try:
+        res = requests.get(
+            f"https://api.github.com/repos/{full_name}/commits/HEAD",
+            headers={"Authorization": f"Bearer {token}", "Accept": "application/vnd.github.sha"},
+            timeout=10,
+        )
+    except requests.RequestException as e:
+        raise ConnectionError(f"GitHub unreachable: {e}")
+
+    rate_limited = res.status_code == 403 and res.headers.get("X-RateLimit-Remaining") == "0"
+    if res.status_code in (401, 403, 404) and not rate_limited:
+        raise PermissionError(f"No access to {full_name} ({res.status_code})")
+    sha = res.text.strip() if res.ok else ""
+    if not sha:
+        raise ConnectionError(f"GitHub returned {res.status_code} for {full_name}")
+    return sha
+
+
+def attach_existing_index(db, repo) -> RepoIndex | None:
+    """
+    Marks a new Repository row indexed right away when another user's run
+    already built the shared index of its full_name.
+    """
+    index = ready_index(db, repo.full_name)
+    if index is None:
+        return None
+    repo.indexed = True
+    repo.last_indexed_sha = index.commit_sha
+    db.commit()
+    print(f"🔗 Repo {repo.id} attached to shared index {index.store_id} @ {index.commit_sha[:12]}")
+    return index
+
+
+def index_is_current(index: RepoIndex, head_sha: str) -> bool:
+    return index.commit_sha == head_sha
+
+
+def mark_indexed(db, index: RepoIndex, head_sha: str):
+    """
+    Records a finished run on the index and on every Repository row sharing it.
+    """
+    index.commit_sha = head_sha
+    index.indexed_at = datetime.utcnow()
+    db.query(Repository).filter(Repository.full_name == index.full_name).update(
+        {"indexed": True, "last_indexed_sha": head_sha}, synchronize_session=False
+    )
+
+
+def queue_outdated_indexes(db) -> int:
+    """
+    Queues a build for every indexed repo without a ready index at the
+    current PIPELINE_VERSION, e.g. after a deploy changed it, so nobody has
+    to reindex by hand. Until the build finishes, the old store keeps
+    serving (see repo_store_id). One job per repo name; names that already
+    have a job queued or running are skipped. Returns the number queued.
+    """
+    queued = 0
+    full_names = {name for (name,) in db.query(Repository.full_name).filter(Repository.indexed.is_(True)).distinct()}
+    for full_name in sorted(full_names):
+        if ready_index(db, full_name) is not None:
+            continue
+        active = (
+            db.query(IndexJob.id)
+            .join(Repository, Repository.id == IndexJob.repo_id)
+            .filter(Repository.full_name == full_name, IndexJob.status.in_(ACTIVE_STATUSES))
+            .first()
+        )
+        if active:
+            continue
+        repo = db.query(Repository).filter(Repository.full_name == full_name).order_by(Repository.id).first()
+        enqueue_index_job(db, repo)
+        queued += 1
+        print(f"🔁 Queued a rebuild of {full_name} at pipeline version {PIPELINE_VERSION}")
+    return queued
+
+
+def collect_unused_indexes(db) -> int:
+    """
+    Deletes shared stores nobody references anymore, stores built by another
+    pipeline version once the current version's store of the repo is ready
+    (they serve queries until then), and per-repo stores from before sharing
+    once their shared replacement is ready. Stores being built are skipped.
+    Returns the number of stores removed.
+    """
+    removed = 0
+    for index in db.query(RepoIndex).all():
+        refs = index_refcount(db, index)
+        if refs and index.pipeline_version == PIPELINE_VERSION:
+            continue
+        if refs and ready_index(db, index.full_name) is None:
+            continue  # still serving until its replacement is built
+        with file_lock(f"{index.store_id}.build", blocking=False) as free:
+            if not free:
+                continue
+            invalidate_vectorstore(index.store_id)
+            path = vectorstore_path(index.store_id)
+            if path.exists():
+                remove_tree(path)
+            if not refs and Path(checkout_path(index.full_name)).exists():
+                remove_tree(Path(checkout_path(index.full_name)))
+            db.delete(index)
+            db.commit()
+        removed += 1
+        print(f"🗑️ Removed index {index.store_id} ({'unreferenced' if not refs else 'old pipeline version'})")
+
+    base = Path(VECTOR_BASE_DIR)
+    for path in sorted(base.iterdir()) if base.exists() else []:
+        if not path.name.isdigit():
+            continue
+        repo = db.get(Repository, int(path.name))
+        if repo is not None and ready_index(db, repo.full_name) is None:
+            continue
+        invalidate_vectorstore(path.name)
+        remove_tree(path)
+        legacy_checkout = Path("data/repos") / path.name
+        if legacy_checkout.exists():
+            remove_tree(legacy_checkout)
+        removed += 1
+        print(f"🗑️ Removed per-repo store {path}")
+    return removed
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy.sql import func
+from database import Base
+
+
+class IndexJob(Base):
+    __tablename__ = "index_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    repo_id = Column(Integer, ForeignKey("repositories.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String(20), default="queued", index=True)  # queued | running | succeeded | failed | cancelled
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, nullable=True)          # backoff: not claimed before this
+    cancel_requested = Column(Boolean, default=False)
+    stage = Column(String(40), nullable=True)            # cloning | indexing | ...
+    items_done = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    worker_id = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
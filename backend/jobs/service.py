@@ -0,0 +1,219 @@
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import func, or_
+
+from jobs.model import IndexJob
+from repositories.model import Repository
+
+load_dotenv()
+
+INDEX_JOB_MAX_ATTEMPTS = int(os.getenv("INDEX_JOB_MAX_ATTEMPTS", "3"))
+# Retry n waits INDEX_RETRY_BASE_SECONDS * 2^(n-1), capped
+INDEX_RETRY_BASE_SECONDS = int(os.getenv("INDEX_RETRY_BASE_SECONDS", "30"))
+INDEX_RETRY_MAX_SECONDS = int(os.getenv("INDEX_RETRY_MAX_SECONDS", "3600"))
+# Jobs one user can have running at once, so a big onboarding can't starve everyone else
+INDEX_MAX_JOBS_PER_USER = int(os.getenv("INDEX_MAX_JOBS_PER_USER", "2"))
+# A running job whose worker hasn't reported for this long is assumed dead and requeued
+INDEX_JOB_STALE_SECONDS = int(os.getenv("INDEX_JOB_STALE_SECONDS", "600"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def enqueue_index_job(db, repo) -> IndexJob:
+    """
+    Queues an index job for repo, or returns the one already queued/running.
+    """
+    job = (
+        db.query(IndexJob)
+        .filter(IndexJob.repo_id == repo.id, IndexJob.status.in_(ACTIVE_STATUSES))
+        .first()
+    )
+    if job:
+        return job
+
+    job = IndexJob(repo_id=repo.id, user_id=repo.user_id, max_attempts=INDEX_JOB_MAX_ATTEMPTS)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def latest_job(db, repo_id: int) -> IndexJob | None:
+    return db.query(IndexJob).filter(IndexJob.repo_id == repo_id).order_by(IndexJob.id.desc()).first()
+
+
+def latest_shared_job(db, full_name: str) -> IndexJob | None:
+    """
+    Latest job building the shared index of full_name, queued through any
+    user's Repository row.
+    """
+    return (
+        db.query(IndexJob)
+        .join(Repository, Repository.id == IndexJob.repo_id)
+        .filter(Repository.full_name == full_name)
+        .order_by(IndexJob.id.desc())
+        .first()
+    )
+
+
+def cancel_job(db, job: IndexJob) -> IndexJob:
+    """
+    Queued jobs are cancelled right away; running ones stop at their next
+    progress report.
+    """
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_next_job(db, worker_id: str) -> IndexJob | None:
+    """
+    Atomically moves the next eligible queued job to running.
+
+    Fairness: users with fewer running jobs go first (FIFO among equals), and
+    nobody gets more than INDEX_MAX_JOBS_PER_USER concurrent jobs. The cap is
+    best-effort when several workers claim at the same instant.
+    """
+    now = datetime.utcnow()
+    running = dict(
+        db.query(IndexJob.user_id, func.count(IndexJob.id))
+        .filter(IndexJob.status == "running")
+        .group_by(IndexJob.user_id)
+        .all()
+    )
+    candidates = (
+        db.query(IndexJob.id, IndexJob.user_id)
+        .filter(IndexJob.status == "queued", or_(IndexJob.run_after.is_(None), IndexJob.run_after <= now))
+        .order_by(IndexJob.id)
+        .limit(500)
+        .all()
+    )
+    candidates = [c for c in candidates if running.get(c.user_id, 0) < INDEX_MAX_JOBS_PER_USER]
+
+    for job_id, _ in sorted(candidates, key=lambda c: (running.get(c.user_id, 0), c.id)):
+        claimed = (
+            db.query(IndexJob)
+            .filter(IndexJob.id == job_id, IndexJob.status == "queued")
+            .update({
+                "status": "running",
+                "worker_id": worker_id,
+                "attempts": IndexJob.attempts + 1,
+                "stage": "starting",
+                "items_done": 0,
+                "error": None,
+                "started_at": now,
+                "heartbeat_at": now,
+            }, synchronize_session=False)
+        )
+        db.commit()
+        if claimed:
+            return db.get(IndexJob, job_id)
+    return None
+
+
+def report_progress(db, job_id: int, stage: str | None = None, items_done: int | None = None):
+    """
+    Records progress and refreshes the heartbeat.
+    Raises JobCancelled if a cancel was requested meanwhile.
+    """
+    values = {"heartbeat_at": datetime.utcnow()}
+    if stage is not None:
+        values["stage"] = stage
+    if items_done is not None:
+        values["items_done"] = items_done
+    db.query(IndexJob).filter(IndexJob.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+    if db.query(IndexJob.cancel_requested).filter(IndexJob.id == job_id).scalar():
+        raise JobCancelled()
+
+
+def heartbeat(db, job_id: int):
+    db.query(IndexJob).filter(IndexJob.id == job_id).update(
+        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+    )
+    db.commit()
+
+
+def finish_job(db, job_id: int, status: str):
+    db.query(IndexJob).filter(IndexJob.id == job_id).update(
+        {"status": status, "stage": status, "finished_at": datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def fail_job(db, job_id: int, error: str) -> IndexJob:
+    """
+    Requeues the job with exponential backoff, or marks it failed once it
+    has used up its attempts.
+    """
+    job = db.get(IndexJob, job_id)
+    job.error = error
+    if job.attempts < job.max_attempts and not job.cancel_requested:
+        delay = min(INDEX_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), INDEX_RETRY_MAX_SECONDS)
+        job.status = "queued"
+        job.stage = "retrying"
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    else:
+        job.status = "cancelled" if job.cancel_requested else "failed"
+        job.stage = job.status
+        job.finished_at = datetime.utcnow()
+    db.commit()
+    return job
+
+
+def requeue_stale_jobs(db) -> int:
+    """
+    Running jobs without a heartbeat for INDEX_JOB_STALE_SECONDS belonged to
+    a worker that died (crash, restart); they go back to the queue.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=INDEX_JOB_STALE_SECONDS)
+    stale = (
+        db.query(IndexJob)
+        .filter(IndexJob.status == "running", IndexJob.heartbeat_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        job.worker_id = None
+        if job.cancel_requested:
+            job.status, job.stage = "cancelled", "cancelled"
+            job.finished_at = datetime.utcnow()
+        elif job.attempts < job.max_attempts:
+            job.status, job.stage = "queued", "requeued"
+        else:
+            # Kept killing its worker; don't loop forever
+            job.status, job.stage = "failed", "failed"
+            job.error = "Worker stopped responding"
+            job.finished_at = datetime.utcnow()
+    db.commit()
+    return len(stale)
+
+
+def job_status(job: IndexJob | None) -> dict:
+    if job is None:
+        return {"status": "none"}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "items_done": job.items_done,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "retry_at": job.run_after if job.status == "queued" else None,
+    }
@@ -0,0 +1,167 @@
+import os
+import multiprocessing
+import socket
+import threading
+import time
+import traceback
+from dotenv import load_dotenv
+
+from database import SessionLocal, init_db
+from ingestion.index_repo import index_repository
+from ingestion.shared_index import collect_unused_indexes, queue_outdated_indexes
+from jobs.service import (
+    INDEX_JOB_STALE_SECONDS,
+    JobCancelled,
+    claim_next_job,
+    fail_job,
+    finish_job,
+    heartbeat,
+    report_progress,
+    requeue_stale_jobs,
+)
+import users.model  # noqa: F401  (tables referenced by index_jobs' foreign keys)
+
+load_dotenv()
+
+# Repos indexed at the same time by this worker node (one process each)
+INDEX_WORKER_CONCURRENCY = int(os.getenv("INDEX_WORKER_CONCURRENCY", "2"))
+INDEX_WORKER_POLL_SECONDS = float(os.getenv("INDEX_WORKER_POLL_SECONDS", "2"))
+# Progress is written at most this often (stage changes are always written)
+PROGRESS_INTERVAL_SECONDS = 2.0
+# How often the supervisor queues rebuilds of outdated indexes and deletes
+# indexes no repository references anymore
+INDEX_GC_INTERVAL_SECONDS = int(os.getenv("INDEX_GC_INTERVAL_SECONDS", "3600"))
+
+
+def keep_alive(job_id: int, done: threading.Event):
+    """
+    Refreshes the job's heartbeat while long steps (a big clone) report no progress.
+    """
+    while not done.wait(INDEX_JOB_STALE_SECONDS / 4):
+        db = SessionLocal()
+        try:
+            heartbeat(db, job_id)
+        except Exception as e:
+            print(f"⚠️ Heartbeat failed for job {job_id}: {e}")
+        finally:
+            db.close()
+
+
+def run_job(job_id: int, repo_id: int):
+    last = {"stage": None, "at": 0.0}
+
+    def progress(stage, items_done=None):
+        now = time.monotonic()
+        if stage == last["stage"] and now - last["at"] < PROGRESS_INTERVAL_SECONDS:
+            return
+        last.update(stage=stage, at=now)
+        db = SessionLocal()
+        try:
+            report_progress(db, job_id, stage=stage, items_done=items_done)
+        finally:
+            db.close()
+
+    done = threading.Event()
+    threading.Thread(target=keep_alive, args=(job_id, done), daemon=True).start()
+
+    db = SessionLocal()
+    try:
+        try:
+            index_repository(repo_id, progress=progress)
+        except JobCancelled:
+            print(f"🛑 Job {job_id} cancelled")
+            finish_job(db, job_id, "cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            job = fail_job(db, job_id, f"{type(e).__name__}: {e}")
+            print(f"❌ Job {job_id} failed (attempt {job.attempts}/{job.max_attempts}), now {job.status}")
+        else:
+            finish_job(db, job_id, "succeeded")
+            print(f"✅ Job {job_id} done")
+    finally:
+        done.set()
+        db.close()
+
+
+def worker_loop(worker_id: str):
+    """
+    One worker process: claims jobs one at a time until killed.
+    """
+    print(f"👷 Worker {worker_id} started")
+    while True:
+        db = SessionLocal()
+        try:
+            job = claim_next_job(db, worker_id)
+            claimed = (job.id, job.repo_id, job.attempts) if job else None
+        except Exception as e:
+            print(f"❌ Worker {worker_id} could not claim a job: {e}")
+            claimed = None
+        finally:
+            db.close()
+
+        if claimed is None:
+            time.sleep(INDEX_WORKER_POLL_SECONDS)
+            continue
+
+        job_id, repo_id, attempt = claimed
+        print(f"🛠️ Worker {worker_id}: job {job_id}, repo {repo_id} (attempt {attempt})")
+        run_job(job_id, repo_id)
+
+
+def main():
+    """
+    Runs INDEX_WORKER_CONCURRENCY worker processes and keeps them alive.
+    Start from backend/:  python -m jobs.worker
+    """
+    init_db()
+
+    # Each job parses with its own process pool; split the CPUs between jobs
+    # unless the extraction pool size was set explicitly
+    os.environ.setdefault("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 1) // INDEX_WORKER_CONCURRENCY)))
+
+    # Worker processes start their own extraction pools, so they can't be daemons
+    context = multiprocessing.get_context("spawn")
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    processes = {}
+
+    def start(i):
+        process = context.Process(target=worker_loop, args=(f"{prefix}-{i}",), name=f"index-worker-{i}")
+        process.start()
+        processes[i] = process
+
+    for i in range(INDEX_WORKER_CONCURRENCY):
+        start(i)
+
+    last_gc = None
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                requeued = requeue_stale_jobs(db)
+                if requeued:
+                    print(f"♻️ Requeued {requeued} jobs from unresponsive workers")
+                if last_gc is None or time.monotonic() - last_gc >= INDEX_GC_INTERVAL_SECONDS:
+                    last_gc = time.monotonic()
+                    queue_outdated_indexes(db)
+                    collect_unused_indexes(db)
+            except Exception as e:
+                print(f"⚠️ Supervisor pass failed: {e}")
+            finally:
+                db.close()
+
+            for i, process in list(processes.items()):
+                if not process.is_alive():
+                    print(f"⚠️ Worker process {i} exited ({process.exitcode}), restarting")
+                    start(i)
+            time.sleep(min(30, INDEX_JOB_STALE_SECONDS / 4))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
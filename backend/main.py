@@ -6,18 +6,33 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))     # backend/
 ROOT_DIR = os.path.dirname(BASE_DIR)                      # Re-You/
 sys.path.insert(0, ROOT_DIR)   # <— the correct way
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from auth.github import router as github_router
-from database import Base, engine
+from database import init_db
 from routes.user import router as user_router
 from routes.repos import router as repos_router
 from routes.setup import router as setup_router
 from fastapi.middleware.cors import CORSMiddleware
 from debug import router as debug_router
 from chat.router import router as chat_router
+from embeddings.model_registry import EMBEDDING_WARMUP, warmup_embedding_model
+from retrieval.reranker import warmup_reranker
 
-Base.metadata.create_all(bind=engine)
-app = FastAPI()
+init_db()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding (and reranker) models before serving so the first question isn't slow
+    if EMBEDDING_WARMUP:
+        await run_in_threadpool(warmup_embedding_model)
+        await run_in_threadpool(warmup_reranker)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+from retrieval.vectorstore_pool import repo_store_id
+
+load_dotenv()
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+# Cosine similarity a new question needs with a cached one to reuse its answer
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+
+def cache_scope(repos) -> tuple:
+    """
+    The selected repo set, the store each is answered from and the commit
+    it was indexed at. Re-indexing a repo, or moving it to a store built by
+    a new PIPELINE_VERSION, changes its scope, so older answers simply stop
+    matching.
+    """
+    return tuple(sorted((repo.id, repo_store_id(repo), repo.last_indexed_sha or "") for repo in repos))
+
+
+class AnswerCache:
+    """
+    In-memory cache of LLM answers, matched by question embedding similarity
+    within a scope. Entries expire after ttl seconds; past max_entries the
+    least recently used one is dropped.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_SIMILARITY, ttl=ANSWER_CACHE_TTL_SECONDS,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (scope, vector, answer, created)
+        self._by_scope = {}            # scope -> set of ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_id):
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._by_scope[scope]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_scope[scope]
+
+    def get(self, scope, embedding):
+        """
+        The cached answer of the most similar question in scope, or None.
+        """
+        vector = self._normalize(embedding)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_scope.get(scope, ())):
+                _, cached, _, created = self._entries[entry_id]
+                if now - created > self.ttl:
+                    self._drop(entry_id)
+                    self.expirations += 1
+                    continue
+                score = float(np.dot(vector, cached))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2]
+
+    def put(self, scope, embedding, answer: dict):
+        vector = self._normalize(embedding)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, vector, answer, time.monotonic())
+            self._by_scope.setdefault(scope, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "scopes": len(self._by_scope),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,179 @@
+import os
+from pathlib import PurePosixPath
+from dotenv import load_dotenv
+
+from retrieval.lexical_index import tokenize
+
+load_dotenv()
+
+# Total size of the snippets section of the prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+# Longer snippets are cut down to the lines around what the question mentions
+SNIPPET_MAX_TOKENS = int(os.getenv("SNIPPET_MAX_TOKENS", "1200"))
+# Lines kept above and below each relevant line when truncating
+SNIPPET_CONTEXT_LINES = int(os.getenv("SNIPPET_CONTEXT_LINES", "6"))
+# Don't bother adding a snippet if less than this is left of the budget
+MIN_SNIPPET_TOKENS = 80
+
+ELISION = "    ..."
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token for code); the Groq models'
+    tokenizer isn't available locally and the budget doesn't need to be exact.
+    """
+    return len(text) // 4 + 1
+
+
+def display_path(hit) -> str:
+    """
+    Path relative to the repo checkout (data/repos/<checkout>/src/x.py -> src/x.py).
+    """
+    path = hit.get("path")
+    if not path:
+        return ""
+    parts = PurePosixPath(path.replace("\\", "/")).parts
+    if len(parts) > 3 and parts[:2] == ("data", "repos"):
+        return "/".join(parts[3:])
+    return path
+
+
+def line_range(hit):
+    meta = hit.get("metadata") or {}
+    start, end = meta.get("start_line"), meta.get("end_line")
+    if start is None or end is None:
+        return None
+    return start, end
+
+
+def is_outline(hit) -> bool:
+    """
+    Python class outlines skip method bodies, so their lines aren't
+    consecutive source lines.
+    """
+    return bool((hit.get("metadata") or {}).get("outline"))
+
+
+def header(hit) -> str:
+    if hit.get("type") == "commit":
+        return f"[{hit['repo']}] commit {hit['name']}"
+    label = f"[{hit['repo']}] {display_path(hit)}"
+    if hit.get("name"):
+        label += f" :: {hit['name']}"
+    span = line_range(hit)
+    if span:
+        label += f" (lines {span[0]}-{span[1]})"
+    return label
+
+
+def drop_overlaps(hits):
+    """
+    Keeps hits in rank order, dropping exact duplicates and any code chunk that
+    repeats text of a better-ranked chunk of the same file: a method that is
+    also inside a retrieved (JS) class, or a class retrieved after one of its
+    methods. A dropped chunk that lies inside a kept one marks those lines as
+    relevant, so truncation keeps them. Chunks that only share a line range
+    (a Python class outline and its methods) are both kept.
+    Returns (hit, focus_ranges) pairs.
+    """
+    kept = []
+    seen_text = set()
+    for hit in hits:
+        text = " ".join(hit["text"].split())
+        if text in seen_text:
+            continue
+
+        span = line_range(hit)
+        redundant = False
+        if span:
+            for other, focus in kept:
+                other_span = line_range(other)
+                if not (other_span and other["repo_id"] == hit["repo_id"] and other["path"] == hit["path"]
+                        and span[0] <= other_span[1] and other_span[0] <= span[1]):
+                    continue
+                other_text = " ".join(other["text"].split())
+                if text in other_text:
+                    focus.append(span)
+                    redundant = True
+                    break
+                if other_text in text:
+                    redundant = True
+                    break
+        if redundant:
+            continue
+
+        seen_text.add(text)
+        kept.append((hit, []))
+    return kept
+
+
+def truncate(text: str, question_terms, max_tokens: int, first_line=None, focus=()):
+    """
+    Cuts text down to roughly max_tokens, keeping the first line (signature)
+    and windows around lines that mention question terms or fall in focus
+    ranges (absolute line numbers, given first_line). first_line must be None
+    when the text isn't consecutive source lines (is_outline). Gaps become "...".
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    relevant = []
+    for i, line in enumerate(lines):
+        absolute = first_line + i if first_line is not None else None
+        in_focus = absolute is not None and any(a <= absolute <= b for a, b in focus)
+        if in_focus or question_terms.intersection(tokenize(line)):
+            relevant.append(i)
+
+    keep = {0}
+    budget = max_tokens - estimate_tokens(lines[0])
+    # Widen around each relevant line in order until the budget runs out;
+    # with nothing relevant, fall back to the head of the snippet
+    for i in relevant or range(len(lines)):
+        window = range(max(0, i - SNIPPET_CONTEXT_LINES), min(len(lines), i + SNIPPET_CONTEXT_LINES + 1))
+        new = [j for j in window if j not in keep]
+        cost = sum(estimate_tokens(lines[j]) for j in new)
+        if cost > budget:
+            break
+        keep.update(new)
+        budget -= cost
+
+    out = []
+    previous = -1
+    for i in sorted(keep):
+        if i != previous + 1:
+            out.append(ELISION)
+        out.append(lines[i])
+        previous = i
+    if previous != len(lines) - 1:
+        out.append(ELISION)
+    return "\n".join(out)
+
+
+def pack_context(question: str, hits, budget=CONTEXT_TOKEN_BUDGET, snippet_max=SNIPPET_MAX_TOKENS):
+    """
+    Dedupes, truncates and tags hits (best first) to fit the prompt budget.
+    Returns (hit, snippet) pairs for the hits that made it in; each snippet
+    starts with a "[repo] path :: name (lines a-b)" header line.
+    """
+    question_terms = set(tokenize(question))
+    packed = []
+    remaining = budget
+
+    for hit, focus in drop_overlaps(hits):
+        if remaining < MIN_SNIPPET_TOKENS:
+            break
+        label = header(hit)
+        limit = min(snippet_max, remaining - estimate_tokens(label))
+        span = line_range(hit)
+        first_line = span[0] if span and not is_outline(hit) else None
+        body = truncate(hit["text"], question_terms, limit, first_line, focus)
+        snippet = f"{label}\n{body}"
+        cost = estimate_tokens(snippet)
+        if cost > remaining:
+            continue
+        packed.append((hit, snippet))
+        remaining -= cost
+
+    return packed
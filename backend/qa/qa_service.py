@@ -1,9 +1,17 @@
 import os
-from chromadb import PersistentClient
-from chromadb.config import Settings
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from sqlalchemy.orm import Session
-from sentence_transformers import SentenceTransformer
+from qa.answer_cache import ANSWER_CACHE_ENABLED, answer_cache, cache_scope
+from qa.context_packer import display_path, pack_context
 from repositories.model import Repository
+from retrieval.commit_index import CommitIndex
+from retrieval.multi_repo import embed_query, retrieve
+from retrieval.reranker import RERANK_ENABLED, RERANK_MAX_CANDIDATES, rerank
+from retrieval.symbol_index import get_symbol_index
+from retrieval.vectorstore_pool import repo_store_id, vectorstore_path
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 
@@ -17,76 +25,151 @@ llm = ChatGroq(
     temperature=0,
 )
 
-# -------- Embeddings --------
-MODEL = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# -------- Async request path --------
+# Blocking work (embedding, Chroma, SQLite) runs here, never on the event loop
+QA_BLOCKING_WORKERS = int(os.getenv("QA_BLOCKING_WORKERS", "8"))
+# LLM calls in flight per worker process; further requests wait on the
+# semaphore without holding a thread
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
 
+_blocking_executor = ThreadPoolExecutor(max_workers=QA_BLOCKING_WORKERS, thread_name_prefix="qa")
+_llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
 
-def load_vectorstore(repo_id: int):
+
+async def run_blocking(fn, *args):
+    """
+    Awaits fn(*args) on the bounded blocking executor.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_blocking_executor, partial(fn, *args))
+
+
+def submit_blocking(fn, *args):
     """
-    Load the vector store for a specific repo (vector_store/<repo_id>)
+    Fire-and-forget fn(*args) on the blocking executor, for cleanup that must
+    run even when the awaiting request has been cancelled.
     """
-    path = f"vector_store/{repo_id}"
+    return _blocking_executor.submit(fn, *args)
 
-    if not os.path.exists(path):
-        print(f"❌ Vector store missing for repo {repo_id}")
-        return None, None
 
-    client = PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+# -------- Symbol lookups --------
+# "where is get_current_user defined?", "find `Store.load`", "`create_vector_store`"
+# A bare name only counts when backticked, so "login?" or "config" still go to the LLM
+_SYMBOL = r"([A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)?)"
+DEFINITION_QUESTION = re.compile(
+    r"^\s*(?:"
+    r"(?:where\s+is|where's|find|locate|go\s+to|(?:show\s+(?:me\s+)?)?(?:the\s+)?definition\s+of)\s+"
+    r"(?:the\s+)?(?:function\s+|method\s+|class\s+)?`?" + _SYMBOL + r"`?(?:\(\))?"
+    r"(?:\s+(?:function|method|class))?(?:\s+(?:defined|declared|implemented))?"
+    r"|`" + _SYMBOL + r"(?:\(\))?`"
+    r")\s*\??\s*$",
+    re.IGNORECASE,
+)
 
-    try:
-        col = client.get_collection("devmemory")
-    except:
-        print(f"❌ Collection missing for repo {repo_id}")
-        return None, None
 
-    return client, col
+# -------- History lookups --------
+# "when did auth/jwt.py change?", "history of `routes/`", "who changed setup.py"
+HISTORY_QUESTION = re.compile(
+    r"^\s*(?:when\s+(?:was|were|did)\s+(?:the\s+)?(?:file\s+|folder\s+|directory\s+)?"
+    r"|who\s+(?:last\s+)?(?:changed|modified|touched|edited)\s+"
+    r"|(?:show\s+(?:me\s+)?)?(?:the\s+)?(?:history|changes|commits)\s+(?:of|to|for|touching)\s+)"
+    r"`?([\w.\-/]+)`?"
+    r"(?:\s+(?:last\s+)?(?:change|changed|modified|touched|updated|edited))?\s*\??\s*$",
+    re.IGNORECASE,
+)
+HISTORY_MAX_COMMITS = int(os.getenv("HISTORY_MAX_COMMITS", "10"))
 
 
-def answer_question(question: str, user, db: Session):
+def answer_history_question(question: str, repos):
     """
-    Multi-repo RAG:
-    - Retrieve top docs from each repo
-    - Merge retrieved docs
-    - Feed to Groq LLM for final answer
+    Answers "when did <path> change" from the repos' commit indexes.
+    Returns None when the question isn't about a path's history or no
+    indexed commit touched it, so the caller falls back to full RAG.
     """
+    match = HISTORY_QUESTION.match(question)
+    if not match:
+        return None
+    target = match.group(1).strip("/")
+    # "when did login change" is about a feature, not a path
+    if "." not in target and "/" not in match.group(1):
+        return None
 
-    # 1️⃣ Find user-selected repositories
-    repos = db.query(Repository).filter(
-        Repository.user_id == user.id,
-        Repository.selected == True,
-    ).all()
+    changes = []
+    for repo in repos:
+        index = CommitIndex.open_readonly(vectorstore_path(repo_store_id(repo)))
+        if index is None:
+            continue
+        try:
+            changes.extend({"repo": repo.full_name, **c} for c in index.commits_touching(target, HISTORY_MAX_COMMITS))
+        finally:
+            index.close()
 
-    if not repos:
-        return {"answer": "You have no repositories selected. Run setup first."}
+    if not changes:
+        return None
+    changes.sort(key=lambda c: c["timestamp"] or 0, reverse=True)
+    changes = changes[:HISTORY_MAX_COMMITS]
+
+    lines = [f"Latest commits touching `{target}`:"]
+    for c in changes:
+        stats = f" (+{c['added']}/-{c['deleted']})" if c["added"] is not None else ""
+        lines.append(
+            f"- **{c['repo']}** `{c['sha'][:10]}` {c['date']} by {c['author']} — {c['subject']} — `{c['path']}`{stats}"
+        )
+
+    return {
+        "answer": "\n".join(lines),
+        "sources": changes,
+        "snippets": [],
+    }
 
-    # 2️⃣ Retrieve from each repo
-    retrieved_context = []
-    sources = []
 
+def answer_symbol_question(question: str, repos):
+    """
+    Answers "where is X defined" straight from the repos' symbol tables.
+    Returns None when the question isn't a definition lookup or nothing matches,
+    so the caller falls back to full RAG.
+    """
+    match = DEFINITION_QUESTION.match(question)
+    if not match:
+        return None
+    name = match.group(1) or match.group(2)
+
+    definitions = []
     for repo in repos:
-        client, col = load_vectorstore(repo.id)
-        if col is None:
+        symbols = get_symbol_index(vectorstore_path(repo_store_id(repo)))
+        if symbols is None:
             continue
+        definitions.extend(
+            {"repo": repo.full_name, **d, "path": display_path(d)} for d in symbols.lookup(name)
+        )
 
-        result = col.query(
-            query_texts=[question],
-            n_results=3
+    if not definitions:
+        return None
+
+    lines = [f"`{name}` is defined in:"]
+    for d in definitions:
+        owner = f" of `{d['parent']}`" if d["parent"] else ""
+        lines.append(
+            f"- **{d['repo']}** — `{d['path']}` lines {d['start_line']}–{d['end_line']} ({d['type']}{owner})"
         )
 
-        docs = result["documents"][0]
+    return {
+        "answer": "\n".join(lines),
+        "sources": definitions,
+        "snippets": [],
+    }
 
-        for doc in docs:
-            retrieved_context.append(doc)
-            sources.append({"repo": repo.full_name, "text": doc})
 
-    if not retrieved_context:
-        return {"answer": "No relevant code found in selected repositories."}
+def selected_repos(user, db: Session):
+    return db.query(Repository).filter(
+        Repository.user_id == user.id,
+        Repository.selected == True,
+    ).all()
 
-    # 3️⃣ Build context block
-    context_block = "\n\n".join([f"---\n{c}" for c in retrieved_context])
 
-    # 4️⃣ Build LLM prompt
-    prompt = f"""
+def build_prompt(question: str, snippets) -> str:
+    context_block = "\n\n".join([f"---\n{c}" for c in snippets])
+
+    return f"""
 You are an expert AI coding assistant.
 
 You must answer the user's question based ONLY on the retrieved code snippets.
@@ -104,12 +187,106 @@ Provide:
 - File or function names if detectable
 """
 
-    # 5️⃣ Generate answer from Groq LLM
-    llm_answer = llm.invoke(prompt).content
 
-    # 6️⃣ Return structured response for UI
-    return {
-        "answer": llm_answer,
-        "sources": sources,
-        "snippets": retrieved_context,
-    }
\ No newline at end of file
+def prepare_answer(question: str, repos):
+    """
+    Everything up to the LLM call. Returns (response, prompt):
+    - a finished response and None when no LLM call is needed
+      (no repos, symbol or history lookup, cached answer, nothing retrieved)
+    - otherwise the response without "answer" (sources, snippets) and the prompt
+    """
+    if not repos:
+        return {"answer": "You have no repositories selected. Run setup first."}, None
+
+    # Exact symbol hits ("where is X defined") skip retrieval and the LLM entirely
+    symbol_answer = answer_symbol_question(question, repos)
+    if symbol_answer is not None:
+        return symbol_answer, None
+
+    # So do "when did <path> change" questions, answered from the commit index
+    history_answer = answer_history_question(question, repos)
+    if history_answer is not None:
+        return history_answer, None
+
+    # Same question (by embedding similarity) against the same index versions
+    if ANSWER_CACHE_ENABLED:
+        cached = answer_cache.get(cache_scope(repos), embed_query(question))
+        if cached is not None:
+            return {**cached, "cached": True}, None
+
+    # Retrieve from all repos concurrently, keep the global top-k
+    # (over-retrieve when a reranker will pick the best few afterwards)
+    if RERANK_ENABLED:
+        hits = retrieve(question, repos, top_k=RERANK_MAX_CANDIDATES, per_repo_k=RERANK_MAX_CANDIDATES)
+    else:
+        hits = retrieve(question, repos)
+    hits = rerank(question, hits)
+
+    # Drop overlapping chunks, trim long ones and fit the token budget
+    packed = pack_context(question, hits)
+
+    retrieved_context = [snippet for _, snippet in packed]
+    sources = [
+        {
+            "repo": hit["repo"],
+            "path": display_path(hit),
+            "name": hit["name"],
+            "score": hit["score"],
+            "text": hit["text"],
+        }
+        for hit, _ in packed
+    ]
+
+    if not retrieved_context:
+        return {"answer": "No relevant code found in selected repositories."}, None
+
+    return {"sources": sources, "snippets": retrieved_context}, build_prompt(question, retrieved_context)
+
+
+def remember_answer(question: str, repos, response: dict):
+    """
+    Stores a finished LLM answer in the semantic answer cache.
+    """
+    if ANSWER_CACHE_ENABLED:
+        answer_cache.put(cache_scope(repos), embed_query(question), response)
+
+
+async def stream_llm_answer(prompt: str):
+    """
+    Yields the answer text piece by piece as the LLM produces it.
+    """
+    async with _llm_slots:
+        async for chunk in llm.astream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+
+async def answer_question(question: str, user, db: Session):
+    """
+    Multi-repo RAG:
+    - Answer exact definition lookups from the symbol index
+    - Reuse the answer to a near-identical recent question on the same index
+    - Retrieve candidates from every repo in parallel
+    - Merge them into a global top-k by distance
+    - Optionally rerank with a cross-encoder within a time budget
+    - Pack non-overlapping, trimmed snippets into a token budget
+    - Feed to Groq LLM for final answer
+    Blocking steps run on the bounded executor; the LLM call is awaited.
+    """
+
+    # 1️⃣ Find user-selected repositories
+    repos = await run_blocking(selected_repos, user, db)
+
+    # 2️⃣ Symbol lookup, answer cache, retrieval and prompt
+    response, prompt = await run_blocking(prepare_answer, question, repos)
+    if prompt is None:
+        return response
+
+    # 3️⃣ Generate answer from Groq LLM
+    async with _llm_slots:
+        llm_answer = (await llm.ainvoke(prompt)).content
+    response = {"answer": llm_answer, **response}
+    await run_blocking(remember_answer, question, repos, response)
+
+    # 4️⃣ Return structured response for UI
+    return response
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
 from sqlalchemy.sql import func
 from database import Base
 
@@ -13,6 +13,42 @@ class Repository(Base):
     private = Column(Boolean)
     selected = Column(Boolean, default=True)
     indexed = Column(Boolean, default=False)
+    last_indexed_sha = Column(String, nullable=True)
     html_url = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
+class RepoIndex(Base):
+    """
+    A vector store shared by every Repository row with the same full_name,
+    built at one PIPELINE_VERSION (see retrieval/vectorstore_pool.py).
+    Its reference count is the number of Repository rows for full_name.
+    """
+    __tablename__ = "repo_indexes"
+
+    id = Column(Integer, primary_key=True)
+    store_id = Column(String, unique=True, index=True)   # vector_store/<store_id>
+    full_name = Column(String, index=True)
+    pipeline_version = Column(String)
+    commit_sha = Column(String, nullable=True)           # None until the first build finishes
+    indexed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IndexRun(Base):
+    """
+    One index_repository run: outcome plus its timings and counters
+    (JSON, see ingestion/index_metrics.py).
+    """
+    __tablename__ = "index_runs"
+
+    id = Column(Integer, primary_key=True)
+    repo_id = Column(Integer, ForeignKey("repositories.id"), index=True)
+    status = Column(String(20))                # succeeded | failed
+    mode = Column(String(20), nullable=True)   # full | incremental | up_to_date
+    head_sha = Column(String, nullable=True)
+    stats = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+COMMIT_INDEX_FILE = "commits.sqlite"
+# Commits written per transaction while indexing
+COMMIT_INDEX_BATCH = int(os.getenv("COMMIT_INDEX_BATCH", "500"))
+
+
+class CommitIndex:
+    """
+    Per-store SQLite table of indexed commits and the files each one changed
+    (repo-relative paths, with line stats when known).
+
+    "When did X change" lookups go through the path indexes instead of
+    scanning history; commit messages themselves are embedded in the
+    store's commit collection. The newest indexed commit is kept as the
+    head, so the next run resumes right after it.
+    """
+
+    def __init__(self, persist_dir, readonly: bool = False):
+        path = Path(persist_dir) / COMMIT_INDEX_FILE
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            # Written from the pipeline's reader thread, read back by the caller
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS commits ("
+                " sha TEXT PRIMARY KEY, timestamp INTEGER, date TEXT, author TEXT, subject TEXT,"
+                " files_changed INTEGER, added INTEGER, deleted INTEGER);"
+                "CREATE TABLE IF NOT EXISTS commit_files ("
+                " sha TEXT, path TEXT, name TEXT, added INTEGER, deleted INTEGER,"
+                " PRIMARY KEY (sha, path));"
+                "CREATE INDEX IF NOT EXISTS idx_commit_files_path ON commit_files(path);"
+                "CREATE INDEX IF NOT EXISTS idx_commit_files_name ON commit_files(name);"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            )
+        self._pending = []
+
+    @classmethod
+    def open_readonly(cls, persist_dir) -> "CommitIndex | None":
+        if not (Path(persist_dir) / COMMIT_INDEX_FILE).exists():
+            return None
+        return cls(persist_dir, readonly=True)
+
+    def head(self) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()
+        return row[0] if row else None
+
+    def set_head(self, sha: str):
+        self.flush()
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('head', ?)", (sha,))
+        self._conn.commit()
+
+    def add(self, commit: dict):
+        self._pending.append(commit)
+        if len(self._pending) >= COMMIT_INDEX_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        commits, files = [], []
+        for commit in self._pending:
+            known = [f for f in commit["files"] if f[1] is not None]
+            commits.append((
+                commit["sha"],
+                commit.get("timestamp"),
+                commit["date"],
+                commit["author"],
+                commit["subject"],
+                len(commit["files"]),
+                sum(f[1] for f in known) if known else None,
+                sum(f[2] for f in known) if known else None,
+            ))
+            files.extend(
+                (commit["sha"], path, path.rsplit("/", 1)[-1], added, deleted)
+                for path, added, deleted in commit["files"]
+            )
+        # Idempotent, so an interrupted run can simply be repeated from the old head
+        self._conn.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?)", commits)
+        self._conn.executemany("INSERT OR REPLACE INTO commit_files VALUES (?, ?, ?, ?, ?)", files)
+        self._conn.commit()
+        self._pending.clear()
+
+    def clear(self):
+        self._pending.clear()
+        self._conn.executescript("DELETE FROM commits; DELETE FROM commit_files; DELETE FROM meta;")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def commits_touching(self, target: str, limit: int = 20) -> list[dict]:
+        """
+        Newest commits that changed target: a repo-relative file path, a
+        trailing part of one ("jwt.py", "auth/jwt.py") or a directory.
+        """
+        target = target.strip("/")
+        name = target.rsplit("/", 1)[-1]
+        rows = self._conn.execute(
+            "SELECT c.sha, c.timestamp, c.date, c.author, c.subject, f.path, f.added, f.deleted"
+            " FROM commit_files f JOIN commits c ON c.sha = f.sha"
+            " WHERE (f.name = ? AND (f.path = ? OR substr(f.path, -?) = ?))"
+            "    OR (f.path >= ? AND f.path < ?)"
+            " ORDER BY c.timestamp DESC LIMIT ?",
+            # "dir/" <= path < "dir0" ('0' follows '/') selects everything under dir/
+            (name, target, len(target) + 1, "/" + target, target + "/", target + "0", limit),
+        ).fetchall()
+        keys = ("sha", "timestamp", "date", "author", "subject", "path", "added", "deleted")
+        return [dict(zip(keys, row)) for row in rows]
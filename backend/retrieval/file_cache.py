@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class MtimeCache:
+    """
+    Small LRU of objects loaded from files, keyed by path and invalidated
+    when the file's mtime changes (i.e. the repo was re-indexed). With
+    max_bytes, entries are also evicted once the sizes sizeof() reports for
+    them add up to more than that.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int | None = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (mtime, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, loader):
+        """
+        Returns loader(path) for an existing file, or None if it doesn't exist.
+        """
+        path = Path(path)
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return None
+
+        key = str(path)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == mtime:
+                self._entries.move_to_end(key)
+                return cached[1]
+
+        value = loader(path)
+        size = self._sizeof(value) if self._sizeof and value is not None else 0
+        with self._lock:
+            replaced = self._entries.pop(key, None)
+            if replaced:
+                self._bytes -= replaced[2]
+            self._entries[key] = (mtime, value, size)
+            self._bytes += size
+            # Keep the most recently used entry even if it alone is over the byte cap
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return value
@@ -0,0 +1,146 @@
+import os
+import gzip
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from dotenv import load_dotenv
+
+from retrieval.file_cache import MtimeCache
+
+load_dotenv()
+
+LEXICAL_INDEX_FILE = "lexical.json.gz"
+# Open lexical indexes kept in memory per process
+LEXICAL_CACHE_SIZE = int(os.getenv("LEXICAL_CACHE_SIZE", "32"))
+# Rough memory cap, estimated from the indexes' term counts (see memory_bytes)
+LEXICAL_CACHE_MAX_MB = int(os.getenv("LEXICAL_CACHE_MAX_MB", "512"))
+# Measured memory per (document, term) entry once postings are built
+LEXICAL_ENTRY_BYTES = 128
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+IDENTIFIER = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]*|\d+")
+# getHTTPResponse2 -> get, HTTP, Response, 2
+WORD_PARTS = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Code-aware tokens: every identifier is kept whole (lowercased) and also
+    split on snake_case and camelCase boundaries, so `get_current_user`
+    matches both the exact name and questions about "current user".
+    """
+    tokens = []
+    for ident in IDENTIFIER.findall(text):
+        whole = ident.lower().strip("_$")
+        if len(whole) > 1:
+            tokens.append(whole)
+        parts = [p.lower() for chunk in ident.split("_") for p in WORD_PARTS.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if len(p) > 1)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    Per-repo BM25 index over the same documents as the Chroma collection.
+
+    Stored next to it as gzipped JSON: {doc_id: [path, length, {term: tf}]}.
+    Postings are rebuilt in memory on load. Documents are removed by path,
+    which is how incremental re-indexing drops the chunks of changed files.
+    """
+
+    def __init__(self, docs=None):
+        self.docs = docs or {}
+        self._postings = None
+
+    @classmethod
+    def load(cls, persist_dir) -> "LexicalIndex | None":
+        path = Path(persist_dir) / LEXICAL_INDEX_FILE
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, persist_dir):
+        path = Path(persist_dir) / LEXICAL_INDEX_FILE
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(self.docs, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held once loaded and searched: the term counts
+        plus the postings built from them, both one entry per (doc, term).
+        """
+        return LEXICAL_ENTRY_BYTES * sum(len(tf) for _, _, tf in self.docs.values())
+
+    def add(self, doc_id: str, text: str, path: str | None = None):
+        tokens = tokenize(text)
+        self.docs[doc_id] = [path or "", len(tokens), dict(Counter(tokens))]
+        self._postings = None
+
+    def remove_paths(self, paths):
+        paths = set(paths)
+        for doc_id in [d for d, (path, _, _) in self.docs.items() if path in paths]:
+            del self.docs[doc_id]
+        self._postings = None
+
+    def _build(self):
+        postings = defaultdict(list)
+        total = 0
+        for doc_id, (_, length, tf) in self.docs.items():
+            total += length
+            for term, count in tf.items():
+                postings[term].append((doc_id, count))
+        self._avg_len = total / len(self.docs) if self.docs else 0.0
+        self._postings = postings
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """
+        Top-k (doc_id, bm25_score), best first.
+        """
+        if self._postings is None:
+            self._build()
+        n = len(self.docs)
+        if not n:
+            return []
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting:
+                length = self.docs[doc_id][1]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (self._avg_len or 1))
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60) -> list[tuple]:
+    """
+    Fuses several best-first lists of keys: score(key) = sum(1 / (k + rank)).
+    Returns (key, score) pairs, best first.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+_cache = MtimeCache(LEXICAL_CACHE_SIZE, LEXICAL_CACHE_MAX_MB * 1024 * 1024, LexicalIndex.memory_bytes)
+
+
+def get_lexical_index(persist_dir) -> LexicalIndex | None:
+    """
+    Cached per directory; reloaded when the file on disk changes (re-index).
+    """
+    return _cache.get(Path(persist_dir) / LEXICAL_INDEX_FILE, lambda path: LexicalIndex.load(path.parent))
@@ -0,0 +1,186 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+from dotenv import load_dotenv
+
+from embeddings.model_registry import get_embedding_model
+from retrieval.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from retrieval.vectorstore_pool import COMMIT_COLLECTION_NAME, repo_store_id, vectorstore_path, vectorstore_pool
+
+load_dotenv()
+
+# Snippets kept after merging every repo's candidates
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+# Candidates fetched per repo before the global merge
+RETRIEVAL_PER_REPO_K = int(os.getenv("RETRIEVAL_PER_REPO_K", "6"))
+# Commit messages fetched per repo; they compete with code on distance
+RETRIEVAL_COMMIT_K = int(os.getenv("RETRIEVAL_COMMIT_K", "2"))
+# Repos that haven't answered by then are left out of this request
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "3"))
+RETRIEVAL_MAX_WORKERS = int(os.getenv("RETRIEVAL_MAX_WORKERS", "16"))
+# Fuse BM25 results over code identifiers with the vector results
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Recent question embeddings kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "512"))
+
+_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_MAX_WORKERS, thread_name_prefix="retrieval")
+
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _embed_query_cached(question: str) -> tuple:
+    return tuple(get_embedding_model().encode([question], show_progress_bar=False)[0].tolist())
+
+
+def embed_query(question: str) -> list:
+    """
+    Embeds a question with the same shared model the documents were indexed
+    with. Repeated questions are served from a small in-process LRU.
+    """
+    return list(_embed_query_cached(" ".join(question.split())))
+
+
+def to_hit(repo_id, full_name, doc_id, doc, meta, distance=None, bm25=None) -> dict:
+    meta = meta or {}
+    return {
+        "id": doc_id,
+        "repo": full_name,
+        "repo_id": repo_id,
+        "path": meta.get("path"),
+        "name": meta.get("name") or meta.get("sha"),
+        "type": meta.get("type"),
+        "distance": distance,
+        "bm25": bm25,
+        # Higher is better; only meant for display and ranking, not a probability.
+        # Replaced by the fused RRF score when hybrid retrieval is on.
+        "score": round(1 / (1 + distance), 4) if distance is not None else None,
+        "text": doc,
+        "metadata": meta,
+    }
+
+
+def query_repo(repo_id, store_id, full_name, question, query_embedding, n_results):
+    """
+    Top n_results candidates from one repo's collection (store_id, possibly
+    shared with other users of the same repo), as hit dicts.
+    Returns (vector_hits, lexical_hits); lexical hits only contain documents
+    the vector search didn't already return. Vector hits include the closest
+    commits from the store's commit collection.
+    """
+    lexical = get_lexical_index(vectorstore_path(store_id)) if HYBRID_RETRIEVAL else None
+
+    with vectorstore_pool.lease(store_id) as col:
+        if col is None:
+            return [], []
+        result = col.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+        )
+        vector_hits = [
+            to_hit(repo_id, full_name, doc_id, doc, meta, distance=distance)
+            for doc_id, doc, meta, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+        lexical_hits = []
+        if lexical is not None:
+            ranked = lexical.search(question, k=n_results)
+            seen = {hit["id"] for hit in vector_hits}
+            bm25 = {doc_id: score for doc_id, score in ranked}
+            missing = [doc_id for doc_id, _ in ranked if doc_id not in seen]
+            fetched = col.get(ids=missing, include=["documents", "metadatas"]) if missing else None
+            docs = {}
+            if fetched:
+                docs = {doc_id: (doc, meta) for doc_id, doc, meta in zip(
+                    fetched["ids"], fetched["documents"], fetched["metadatas"]
+                )}
+            by_id = {hit["id"]: hit for hit in vector_hits}
+            for doc_id, _ in ranked:
+                if doc_id in by_id:
+                    by_id[doc_id]["bm25"] = bm25[doc_id]
+                    lexical_hits.append(by_id[doc_id])
+                elif doc_id in docs:
+                    doc, meta = docs[doc_id]
+                    lexical_hits.append(to_hit(repo_id, full_name, doc_id, doc, meta, bm25=bm25[doc_id]))
+
+    if RETRIEVAL_COMMIT_K:
+        with vectorstore_pool.lease(store_id, COMMIT_COLLECTION_NAME) as commits:
+            if commits is not None and commits.count() > 0:
+                result = commits.query(
+                    query_embeddings=[query_embedding],
+                    n_results=min(RETRIEVAL_COMMIT_K, n_results),
+                    include=["documents", "metadatas", "distances"],
+                )
+                vector_hits.extend(
+                    to_hit(repo_id, full_name, doc_id, doc, meta, distance=distance)
+                    for doc_id, doc, meta, distance in zip(
+                        result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+                    )
+                )
+
+    return vector_hits, lexical_hits
+
+
+def fuse(vector_hits, lexical_hits, top_k):
+    """
+    Reciprocal rank fusion of the global vector ranking (by distance) and
+    the global lexical ranking (by BM25).
+    """
+    vector_hits = sorted(vector_hits, key=lambda hit: hit["distance"])
+    if not lexical_hits:
+        return vector_hits[:top_k]
+    lexical_hits = sorted(lexical_hits, key=lambda hit: hit["bm25"], reverse=True)
+
+    def key(hit):
+        return hit["repo_id"], hit["id"]
+
+    by_key = {key(hit): hit for hit in vector_hits + lexical_hits}
+    fused = reciprocal_rank_fusion(
+        [[key(hit) for hit in vector_hits], [key(hit) for hit in lexical_hits]],
+        k=RRF_K,
+    )
+
+    results = []
+    for hit_key, score in fused[:top_k]:
+        hit = by_key[hit_key]
+        hit["score"] = round(score, 6)
+        results.append(hit)
+    return results
+
+
+def retrieve(question, repos, top_k=RETRIEVAL_TOP_K, per_repo_k=RETRIEVAL_PER_REPO_K,
+             timeout=RETRIEVAL_TIMEOUT_SECONDS):
+    """
+    Queries all repos concurrently and merges their candidates into one
+    global top_k, so weak matches from unrelated repos don't take slots
+    from strong ones. Slow or failing repos are skipped.
+    The question is embedded once and the vector reused for every repo.
+    With HYBRID_RETRIEVAL, BM25 hits on code identifiers are fused in with
+    reciprocal rank fusion; otherwise hits are ranked by distance alone.
+    """
+    query_embedding = embed_query(question)
+    futures = {
+        _executor.submit(
+            query_repo, repo.id, repo_store_id(repo), repo.full_name, question, query_embedding, per_repo_k
+        ): repo
+        for repo in repos
+    }
+    done, not_done = wait(futures, timeout=timeout)
+
+    for future in not_done:
+        future.cancel()
+        print(f"⏱️ Retrieval timed out for repo {futures[future].full_name}")
+
+    vector_hits, lexical_hits = [], []
+    for future in done:
+        try:
+            repo_vector_hits, repo_lexical_hits = future.result()
+        except Exception as e:
+            print(f"❌ Retrieval failed for repo {futures[future].full_name}: {e}")
+            continue
+        vector_hits.extend(repo_vector_hits)
+        lexical_hits.extend(repo_lexical_hits)
+
+    return fuse(vector_hits, lexical_hits, top_k)
@@ -1,24 +1,42 @@
 import os
 from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
 from chromadb.config import Settings
+from retrieval.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from retrieval.multi_repo import embed_query
 
-# ✅ Load the same embedding model used during storage
-model = SentenceTransformer("all-MiniLM-L6-v2")
+VECTOR_DIR = "vector_store"
 
 # ✅ Connect to existing Chroma DB
-client = PersistentClient(path="vector_store", settings=Settings(anonymized_telemetry=False))
+client = PersistentClient(path=VECTOR_DIR, settings=Settings(anonymized_telemetry=False))
 collection = client.get_collection("devmemory")
 
 def query_rag(question, top_k=5):
-    query_embedding = model.encode([question])
+    # ✅ Same shared embedding model used during storage
+    query_embedding = [embed_query(question)]
 
     results = collection.query(
         query_embeddings=query_embedding,
         n_results=top_k,
         where={"type": {"$ne": "commit"}}   # ✅ Exclude commits
     )
-    return results
+
+    # ✅ Fuse exact-identifier (BM25) hits in with reciprocal rank fusion
+    lexical = get_lexical_index(VECTOR_DIR)
+    if lexical is None:
+        return results
+
+    vector_ids = results["ids"][0]
+    lexical_ids = [doc_id for doc_id, _ in lexical.search(question, k=top_k) if not doc_id.startswith("commit_")]
+    fused_ids = [doc_id for doc_id, _ in reciprocal_rank_fusion([vector_ids, lexical_ids])][:top_k]
+
+    fetched = collection.get(ids=fused_ids, include=["documents", "metadatas"])
+    by_id = dict(zip(fetched["ids"], zip(fetched["documents"], fetched["metadatas"])))
+    fused_ids = [doc_id for doc_id in fused_ids if doc_id in by_id]
+    return {
+        "ids": [fused_ids],
+        "documents": [[by_id[doc_id][0] for doc_id in fused_ids]],
+        "metadatas": [[by_id[doc_id][1] for doc_id in fused_ids]],
+    }
 
 if __name__ == "__main__":
     while True:
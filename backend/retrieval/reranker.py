@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Wall-clock budget for waiting for a slot plus scoring; past it the retrieval order is used as-is
+RERANK_BUDGET_MS = int(os.getenv("RERANK_BUDGET_MS", "300"))
+# Candidates retrieved for reranking (over-retrieval), and how many survive it
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "24"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+# Snippets are cut to this many characters before scoring; the model sees 512 tokens at most
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "1500"))
+# Scoring calls run at once; torch already spreads each one over the CPU cores
+RERANK_CONCURRENCY = int(os.getenv("RERANK_CONCURRENCY", "2"))
+
+_model = None
+_model_lock = threading.Lock()
+# A request waits for a free slot within its budget; a call that blew its
+# budget keeps its slot until it finishes, so nothing queues up behind it
+_executor = ThreadPoolExecutor(max_workers=RERANK_CONCURRENCY, thread_name_prefix="rerank")
+_slots = threading.Semaphore(RERANK_CONCURRENCY)
+
+
+def get_reranker():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                # Imported here: pulling in torch is most of the load time
+                from sentence_transformers import CrossEncoder
+
+                print(f"🧠 Loading reranker {RERANK_MODEL_NAME}…")
+                _model = CrossEncoder(RERANK_MODEL_NAME, device="cpu")
+    return _model
+
+
+def warmup_reranker():
+    if RERANK_ENABLED:
+        get_reranker().predict([("warmup", "warmup")])
+
+
+def _score(question, hits):
+    try:
+        pairs = [(question, hit["text"][:RERANK_MAX_CHARS]) for hit in hits]
+        # Single batched forward pass over all candidates
+        return get_reranker().predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+    finally:
+        _slots.release()
+
+
+def rerank(question, hits, top_n=RERANK_TOP_N, budget_ms=RERANK_BUDGET_MS, max_candidates=RERANK_MAX_CANDIDATES):
+    """
+    Reorders retrieval hits with a local cross-encoder and keeps the best top_n.
+    Falls back to the retrieval order when reranking is off or fails, or
+    when waiting for a slot plus scoring takes longer than budget_ms.
+    """
+    if not RERANK_ENABLED:
+        return hits
+    candidates = hits[:max_candidates]
+    if len(candidates) <= 1:
+        return candidates[:top_n]
+
+    deadline = time.monotonic() + budget_ms / 1000
+    if not _slots.acquire(timeout=budget_ms / 1000):
+        print(f"⏱️ Reranker busy for {budget_ms}ms, keeping retrieval order")
+        return candidates[:top_n]
+
+    try:
+        future = _executor.submit(_score, question, candidates)
+    except Exception:
+        _slots.release()
+        raise
+
+    try:
+        scores = future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except TimeoutError:
+        print(f"⏱️ Rerank exceeded {budget_ms}ms, keeping retrieval order")
+        return candidates[:top_n]
+    except Exception as e:
+        print(f"❌ Rerank failed: {e}")
+        return candidates[:top_n]
+
+    for hit, score in zip(candidates, scores):
+        hit["rerank_score"] = float(score)
+    return sorted(candidates, key=lambda hit: hit["rerank_score"], reverse=True)[:top_n]
@@ -0,0 +1,132 @@
+import os
+import gzip
+import json
+from bisect import bisect_left
+from pathlib import Path
+from dotenv import load_dotenv
+
+from retrieval.file_cache import MtimeCache
+
+load_dotenv()
+
+SYMBOL_INDEX_FILE = "symbols.json.gz"
+SYMBOL_CACHE_SIZE = int(os.getenv("SYMBOL_CACHE_SIZE", "64"))
+
+# Row layout, kept as plain lists so the file stays small
+NAME, PARENT, TYPE, PATH, START, END = range(6)
+SYMBOL_TYPES = {"function", "method", "class", "interface", "enum"}
+
+
+class SymbolIndex:
+    """
+    Per-repo table of function/class definitions: name, enclosing class,
+    kind, path and line range.
+
+    Rows are kept sorted by lowercased name, so exact and prefix lookups
+    are a bisect over an in-memory list. Saved as gzipped JSON next to the
+    repo's vector store.
+    """
+
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self._keys = None
+
+    @classmethod
+    def load(cls, persist_dir) -> "SymbolIndex | None":
+        path = Path(persist_dir) / SYMBOL_INDEX_FILE
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            index = cls(json.load(f))
+        # Saved sorted; build the keys now so concurrent readers never sort
+        index._keys = [row[NAME].lower() for row in index.rows]
+        return index
+
+    def save(self, persist_dir):
+        self._sort()
+        path = Path(persist_dir) / SYMBOL_INDEX_FILE
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(self.rows, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def add_chunk(self, chunk: dict):
+        # Long functions are split into parts; the first one stands for the definition
+        if chunk.get("type") not in SYMBOL_TYPES or chunk.get("part", 1) > 1:
+            return
+        self.rows.append([
+            chunk["name"],
+            chunk.get("parent") or "",
+            chunk["type"],
+            chunk["path"],
+            chunk.get("start_line") or 0,
+            chunk.get("def_end_line") or chunk.get("end_line") or 0,
+        ])
+        self._keys = None
+
+    def remove_paths(self, paths):
+        paths = set(paths)
+        self.rows = [row for row in self.rows if row[PATH] not in paths]
+        self._keys = None
+
+    def _sort(self):
+        if self._keys is None:
+            self.rows.sort(key=lambda row: (row[NAME].lower(), row[PATH], row[START]))
+            self._keys = [row[NAME].lower() for row in self.rows]
+
+    def lookup(self, name: str) -> list[dict]:
+        """
+        Exact definitions of `name` (case-insensitive). `Class.method` restricts
+        the match to methods of that class.
+        """
+        self._sort()
+        parent = None
+        if "." in name:
+            parent, name = name.rsplit(".", 1)
+        key = name.lower()
+
+        results = []
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            row = self.rows[i]
+            if parent is None or row[PARENT].lower() == parent.lower():
+                results.append(self._to_dict(row))
+            i += 1
+
+        # Prefer exact-case matches when the name is ambiguous across case
+        exact = [r for r in results if r["name"] == name]
+        return exact or results
+
+    def complete(self, prefix: str, limit: int = 20) -> list[dict]:
+        """
+        Definitions whose name starts with prefix, alphabetically.
+        """
+        self._sort()
+        key = prefix.lower()
+        results = []
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key) and len(results) < limit:
+            results.append(self._to_dict(self.rows[i]))
+            i += 1
+        return results
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "name": row[NAME],
+            "parent": row[PARENT] or None,
+            "type": row[TYPE],
+            "path": row[PATH],
+            "start_line": row[START],
+            "end_line": row[END],
+        }
+
+
+_cache = MtimeCache(SYMBOL_CACHE_SIZE)
+
+
+def get_symbol_index(persist_dir) -> SymbolIndex | None:
+    """
+    Cached per directory; reloaded when the file on disk changes (re-index).
+    """
+    return _cache.get(Path(persist_dir) / SYMBOL_INDEX_FILE, lambda path: SymbolIndex.load(path.parent))
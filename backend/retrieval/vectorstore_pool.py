@@ -0,0 +1,350 @@
+import os
+import glob
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+import chromadb
+from chromadb import PersistentClient
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+from embeddings.model_registry import EMBEDDING_MODEL_NAME
+from embeddings.near_duplicates import NEAR_DUPLICATE_DEDUP
+from extraction.parse_cache import PARSER_VERSION
+
+load_dotenv()
+
+VECTOR_BASE_DIR = "vector_store"
+COLLECTION_NAME = "devmemory"
+# Commit messages, kept apart from code so history is never rebuilt along with it
+COMMIT_COLLECTION_NAME = "commits"
+# Written last by a successful index run, holds the indexed commit SHA
+INDEX_READY_FILE = "indexed_sha"
+
+# Everything that changes what an index contains. When it changes, the
+# index workers queue a rebuild of every indexed repo (queue_outdated_indexes
+# in ingestion/shared_index.py); the old stores keep serving until their
+# rebuild is ready and are collected after. Bump the leading number when the
+# pipeline changes in a way the settings below don't capture
+# (2: commits moved to their own collection).
+PIPELINE_VERSION = f"2:{EMBEDDING_MODEL_NAME}:{PARSER_VERSION}:dd{int(NEAR_DUPLICATE_DEDUP)}"
+
+# Open stores kept warm per process
+VECTORSTORE_POOL_SIZE = int(os.getenv("VECTORSTORE_POOL_SIZE", "32"))
+# Rough memory cap, measured as the on-disk size of the HNSW segments
+VECTORSTORE_POOL_MAX_MB = int(os.getenv("VECTORSTORE_POOL_MAX_MB", "2048"))
+
+
+def vectorstore_path(store_id) -> Path:
+    return Path(VECTOR_BASE_DIR) / str(store_id)
+
+
+def shared_store_id(full_name: str) -> str:
+    """
+    Store shared by every user who selected full_name, at the current PIPELINE_VERSION.
+    """
+    digest = hashlib.sha1(f"{full_name}\0{PIPELINE_VERSION}".encode("utf-8")).hexdigest()[:16]
+    return f"{full_name.replace('/', '__')}-{digest}"
+
+
+def indexed_sha(store_id) -> str | None:
+    """
+    Commit a store was last fully indexed at, None while its first build is running.
+    """
+    marker = vectorstore_path(store_id) / INDEX_READY_FILE
+    try:
+        return marker.read_text().strip() or None
+    except OSError:
+        return None
+
+
+def previous_store_id(full_name: str) -> str | None:
+    """
+    Most recently built shared store of full_name at any other PIPELINE_VERSION.
+    """
+    prefix = full_name.replace("/", "__") + "-"
+    built = []
+    for path in Path(VECTOR_BASE_DIR).glob(glob.escape(prefix) + "*"):
+        if not re.fullmatch(r"[0-9a-f]{16}", path.name[len(prefix):]):
+            continue  # another repo whose name starts the same
+        marker = path / INDEX_READY_FILE
+        if marker.exists() and path.name != shared_store_id(full_name):
+            built.append((marker.stat().st_mtime, path.name))
+    return max(built)[1] if built else None
+
+
+def repo_store_id(repo) -> str:
+    """
+    Store to query for a Repository row: the shared one once it has been
+    built. Until then (first build, or a rebuild after PIPELINE_VERSION
+    changed) the last store built by an older version, or the repo's own
+    vector_store/<id> from before sharing, keeps serving.
+    """
+    shared = shared_store_id(repo.full_name)
+    if indexed_sha(shared) is not None:
+        return shared
+    previous = previous_store_id(repo.full_name)
+    if previous is not None:
+        return previous
+    if vectorstore_path(repo.id).exists():
+        return str(repo.id)
+    return shared
+
+
+def _ready_version(store_id):
+    """
+    Identifies the last completed index run of a store (its INDEX_READY_FILE
+    is rewritten by every run), None while there is none.
+    """
+    try:
+        stat = (vectorstore_path(store_id) / INDEX_READY_FILE).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _segment_bytes(path: Path) -> int:
+    """
+    HNSW segment files are what a loaded collection keeps in memory;
+    the SQLite file is paged in lazily and not counted.
+    """
+    total = 0
+    for child in path.iterdir():
+        if child.is_dir():
+            total += sum(f.stat().st_size for f in child.rglob("*") if f.is_file())
+    return total
+
+
+def _system_cache():
+    """
+    Chroma's process-wide cache of one System per path (a private detail,
+    present since chromadb 0.5), or None when this chromadb doesn't have it.
+    """
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+    except ImportError:
+        return None
+    cache = getattr(SharedSystemClient, "_identifier_to_system", None)
+    return cache if isinstance(cache, dict) else None
+
+
+_SYSTEM_CACHE = _system_cache()
+if _SYSTEM_CACHE is None:
+    print(f"⚠️ chromadb {chromadb.__version__}: can't release closed vector stores, evicted ones stay in memory")
+
+
+def _close_client(client):
+    """
+    Drops the client's System from Chroma's cache and stops it so its HNSW
+    index is actually released. Without that cache (other chromadb versions)
+    the client is only dereferenced.
+    """
+    identifier = getattr(client, "_identifier", None)
+    system = getattr(client, "_system", None)
+    if _SYSTEM_CACHE is None or identifier is None or system is None:
+        return
+    try:
+        _SYSTEM_CACHE.pop(identifier, None)
+        system.stop()
+    except Exception as e:
+        print(f"⚠️ Failed to close vector store client: {e}")
+
+
+class _Entry:
+    __slots__ = ("client", "collection", "others", "size", "version", "leases", "retired")
+
+    def __init__(self, client, collection, size, version):
+        self.client = client
+        self.collection = collection
+        self.others = {}
+        self.size = size
+        self.version = version
+        self.leases = 0
+        self.retired = False
+
+    def named(self, name):
+        """
+        Another collection of the same store, looked up on first use; None if missing.
+        """
+        if name == COLLECTION_NAME:
+            return self.collection
+        if name not in self.others:
+            try:
+                self.others[name] = self.client.get_collection(name)
+            except Exception:
+                self.others[name] = None
+        return self.others[name]
+
+
+class VectorStorePool:
+    """
+    Process-level LRU cache of open Chroma clients/collections keyed by store ID.
+
+    Stores are re-indexed by other processes (jobs.worker), so every lease
+    checks the store's ready marker and reopens it, other collections
+    included, when an index run finished since it was opened.
+
+    Bounded by entry count and by approximate memory. Cold opens for
+    different stores run in parallel, and concurrent opens of the same store
+    wait for one another. Entries that are evicted or invalidated while
+    leased are closed when the last lease is released.
+    """
+
+    def __init__(self, max_entries=VECTORSTORE_POOL_SIZE, max_bytes=VECTORSTORE_POOL_MAX_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._opening = {}
+        # Stores invalidated while being opened; such an open isn't cached
+        self._stale_opens = set()
+
+    def _open(self, store_id, version):
+        path = vectorstore_path(store_id)
+        if not path.exists():
+            print(f"❌ Vector store missing for store {store_id}")
+            return None
+
+        client = PersistentClient(path=str(path), settings=Settings(anonymized_telemetry=False))
+        try:
+            col = client.get_collection(COLLECTION_NAME)
+        except Exception:
+            print(f"❌ Collection missing for store {store_id}")
+            _close_client(client)
+            return None
+
+        return _Entry(client, col, _segment_bytes(path), version)
+
+    def _cached(self, store_id, version):
+        """
+        Must hold self._lock. Leases the pooled entry if it is still current;
+        an entry from before the store's last index run is retired instead.
+        Returns (entry, client to close now).
+        """
+        entry = self._entries.get(store_id)
+        if entry is None:
+            return None, None
+        if entry.version != version:
+            return None, self._retire(store_id)
+        self._entries.move_to_end(store_id)
+        entry.leases += 1
+        self.hits += 1
+        return entry, None
+
+    def _acquire(self, store_id):
+        version = _ready_version(store_id)
+        with self._lock:
+            entry, to_close = self._cached(store_id, version)
+            if entry is None:
+                opening = self._opening.setdefault(store_id, threading.Lock())
+        if to_close is not None:
+            _close_client(to_close)
+        if entry is not None:
+            return entry
+
+        with opening:
+            with self._lock:
+                entry, to_close = self._cached(store_id, version)
+                if entry is not None and self._opening.get(store_id) is opening:
+                    del self._opening[store_id]
+            if to_close is not None:
+                _close_client(to_close)
+            if entry is not None:
+                return entry
+
+            entry = self._open(store_id, version)
+
+            with self._lock:
+                if self._opening.get(store_id) is opening:
+                    del self._opening[store_id]
+                stale = store_id in self._stale_opens
+                self._stale_opens.discard(store_id)
+                self.misses += 1
+                if entry is None:
+                    return None
+                entry.leases += 1
+                if stale:
+                    # Serve this caller, but close it after and reopen next time
+                    entry.retired = True
+                    return entry
+                self._entries[store_id] = entry
+                self._bytes += entry.size
+                self._evict()
+                return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.leases -= 1
+            close = entry.retired and entry.leases == 0
+        if close:
+            _close_client(entry.client)
+
+    def _retire(self, store_id):
+        """
+        Must hold self._lock. Returns the client to close now, if any.
+        """
+        entry = self._entries.pop(store_id, None)
+        if entry is None:
+            return None
+        self._bytes -= entry.size
+        entry.retired = True
+        return entry.client if entry.leases == 0 else None
+
+    def _evict(self):
+        # Keep the most recently used entry even if it alone is over the byte cap
+        to_close = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            to_close.append(self._retire(oldest))
+        for client in to_close:
+            if client is not None:
+                _close_client(client)
+
+    @contextmanager
+    def lease(self, store_id, name=COLLECTION_NAME):
+        """
+        Yields the store's collection (or None if it isn't indexed) and keeps
+        it open for the duration of the block. name picks another collection
+        of the store, e.g. COMMIT_COLLECTION_NAME.
+        """
+        entry = self._acquire(store_id)
+        try:
+            yield entry.named(name) if entry else None
+        finally:
+            if entry is not None:
+                self._release(entry)
+
+    def invalidate(self, store_id):
+        """
+        Drops a store from the pool, e.g. because it is being re-indexed.
+        """
+        with self._lock:
+            client = self._retire(store_id)
+            if store_id in self._opening:
+                self._stale_opens.add(store_id)
+        if client is not None:
+            _close_client(client)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+vectorstore_pool = VectorStorePool()
+
+
+def invalidate_vectorstore(store_id):
+    vectorstore_pool.invalidate(store_id)
@@ -1,10 +1,15 @@
+import json
 import requests
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from auth.jwt import get_current_user
 from database import get_db
 from repositories.service import toggle_repository_selection
-from repositories.model import Repository
+from repositories.model import IndexRun, Repository
+from jobs.service import cancel_job, enqueue_index_job, job_status, latest_job, latest_shared_job
+from qa.context_packer import display_path
+from retrieval.symbol_index import get_symbol_index
+from retrieval.vectorstore_pool import repo_store_id, vectorstore_path
 
 router = APIRouter(prefix="/repos", tags=["repos"])
 
@@ -76,3 +81,117 @@ def toggle_repo(
         "indexed": repo.indexed,
         "full_name": repo.full_name,
     }
+
+
+def get_user_repo(db, user, repo_id: int) -> Repository:
+    repo = db.query(Repository).filter(
+        Repository.id == repo_id,
+        Repository.user_id == user.id,
+    ).first()
+    if not repo:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    return repo
+
+
+@router.get("/{repo_id}/index-status")
+def index_status(
+    repo_id: int,
+    user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """
+    State of the latest job building the repo's shared index (queued,
+    running with stage and progress, or how it finished), whichever user
+    queued it.
+    """
+    repo = get_user_repo(db, user, repo_id)
+    return {
+        "repo_id": repo.id,
+        "indexed": repo.indexed,
+        "last_indexed_sha": repo.last_indexed_sha,
+        "job": job_status(latest_shared_job(db, repo.full_name)),
+    }
+
+
+@router.post("/{repo_id}/reindex")
+def reindex_repo(
+    repo_id: int,
+    user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    repo = get_user_repo(db, user, repo_id)
+    return job_status(enqueue_index_job(db, repo))
+
+
+@router.post("/{repo_id}/index-cancel")
+def cancel_index(
+    repo_id: int,
+    user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    repo = get_user_repo(db, user, repo_id)
+    job = latest_job(db, repo.id)
+    if not job or job.status not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="No active index job")
+    return job_status(cancel_job(db, job))
+
+
+@router.get("/{repo_id}/index-runs")
+def index_runs(
+    repo_id: int,
+    limit: int = 10,
+    user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """
+    Recent runs building the repo's shared index, newest first, with
+    per-stage timings, counters and peak memory.
+    """
+    repo = get_user_repo(db, user, repo_id)
+    runs = db.query(IndexRun).join(
+        Repository, Repository.id == IndexRun.repo_id
+    ).filter(
+        Repository.full_name == repo.full_name
+    ).order_by(IndexRun.id.desc()).limit(min(limit, 100)).all()
+
+    return [
+        {
+            "id": run.id,
+            "status": run.status,
+            "mode": run.mode,
+            "head_sha": run.head_sha,
+            "error": run.error,
+            "started_at": run.started_at,
+            "finished_at": run.finished_at,
+            "stats": json.loads(run.stats) if run.stats else None,
+        }
+        for run in runs
+    ]
+
+
+@router.get("/symbols")
+def complete_symbols(
+    prefix: str,
+    limit: int = 20,
+    user = Depends(get_current_user),
+    db = Depends(get_db),
+):
+    """
+    Autocomplete function/class names across the user's selected repos.
+    """
+    repos = db.query(Repository).filter(
+        Repository.user_id == user.id,
+        Repository.selected == True,
+    ).all()
+
+    results = []
+    for repo in repos:
+        symbols = get_symbol_index(vectorstore_path(repo_store_id(repo)))
+        if symbols is None:
+            continue
+        results.extend(
+            {"repo": repo.full_name, **d, "path": display_path(d)} for d in symbols.complete(prefix, limit)
+        )
+
+    results.sort(key=lambda d: (d["name"].lower(), d["repo"], d["path"]))
+    return results[:limit]
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from auth.jwt import get_current_user
 from database import get_db
 from repositories.model import Repository
-from ingestion.index_repo import index_repository
+from jobs.service import enqueue_index_job
+from ingestion.shared_index import attach_existing_index, github_head_sha, index_is_current
 
 router = APIRouter(prefix="/setup", tags=["setup"])
 
@@ -16,10 +17,20 @@ class SetupPayload(BaseModel):
 @router.post("/complete")
 def complete_setup(
     payload: SetupPayload,
-    background_tasks: BackgroundTasks,
     user=Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # Indexes are shared between users, so check the user can see every repo first;
+    # nothing is attached unless GitHub confirmed it
+    head_shas = {}
+    for full_name in payload.repositories:
+        try:
+            head_shas[full_name] = github_head_sha(full_name, user.github_access_token)
+        except PermissionError:
+            raise HTTPException(status_code=403, detail=f"No access to {full_name}")
+        except ConnectionError:
+            raise HTTPException(status_code=503, detail=f"Couldn't check access to {full_name} with GitHub, try again later")
+
     for full_name in payload.repositories:
         owner, repo_name = full_name.split("/")
 
@@ -35,7 +46,12 @@ def complete_setup(
         db.commit()
         db.refresh(repo)
 
-        background_tasks.add_task(index_repository, repo.id)
+        # Someone already indexed this repo: usable right away, refreshed in
+        # the background only if it is behind
+        index = attach_existing_index(db, repo)
+        if index is None or not index_is_current(index, head_shas[full_name]):
+            # Picked up by the index workers (python -m jobs.worker)
+            enqueue_index_job(db, repo)
 
     user.needs_setup = False
     db.commit()
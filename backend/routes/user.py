@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends
 from auth.jwt import get_current_user
 from database import get_db
 from fastapi import Depends
-from repositories.model import Repository
+from sqlalchemy import func
+from repositories.model import RepoIndex, Repository
 
 router = APIRouter()
 
@@ -15,6 +16,14 @@ def get_user(user=Depends(get_current_user), db=Depends(get_db)):
         Repository.user_id == user.id,
         Repository.selected == True
     ).all()
+
+    # Indexes are shared by repo name, whichever user's run built them
+    last_indexed = dict(
+        db.query(RepoIndex.full_name, func.max(RepoIndex.indexed_at))
+        .filter(RepoIndex.full_name.in_({repo.full_name for repo in repos}))
+        .group_by(RepoIndex.full_name)
+        .all()
+    )
     
     return {
         "id": user.id,
@@ -29,7 +38,7 @@ def get_user(user=Depends(get_current_user), db=Depends(get_db)):
                 "full_name": repo.full_name,
                 "indexed": repo.indexed,
                 "selected": repo.selected,
-                "last_indexed": None  # Add this field to your model if needed
+                "last_indexed": last_indexed.get(repo.full_name),
             }
             for repo in repos
         ]
@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# When full, evict least recently used entries down to this fraction of the max
+EVICT_TO = 0.9
+
+
+class SQLiteLRUCache:
+    """
+    Key -> blob table in a SQLite file, evicted least-recently-used once it
+    grows past max_entries. Backed by SQLite (WAL) so concurrent indexing
+    processes can share it. hits/misses count lookups since the process started.
+
+    Subclasses pick the table and value column and convert values to and
+    from bytes (encode_value / decode_value). With a version, rows are
+    stored under "version:key", so processes running different versions
+    (e.g. mid rolling deploy) share the file without seeing or deleting each
+    other's rows; rows nobody reads anymore age out through LRU eviction.
+    """
+
+    table = None
+    value_column = "value"
+    version = None
+
+    def __init__(self, path: str, max_entries: int):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        version_column = " version TEXT NOT NULL," if self.version is not None else ""
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f" key TEXT PRIMARY KEY,{version_column}"
+            f" {self.value_column} BLOB NOT NULL,"
+            f" last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_used ON {self.table}(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def encode_value(self, value) -> bytes:
+        return value
+
+    def decode_value(self, blob: bytes):
+        return blob
+
+    def _stored_key(self, key: str) -> str:
+        return key if self.version is None else f"{self.version}:{key}"
+
+    def get_many(self, keys):
+        """
+        Returns {key: value} for the keys that are cached and bumps their recency.
+        """
+        found = {}
+        stored = {self._stored_key(key): key for key in keys}
+        with self._lock:
+            names = list(stored)
+            for i in range(0, len(names), 500):
+                part = names[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, {self.value_column} FROM {self.table} WHERE key IN ({marks})", part
+                )
+                for name, blob in rows:
+                    found[stored[name]] = self.decode_value(blob)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                    [(now, self._stored_key(k)) for k in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        items: iterable of (key, value). Keys already cached are left alone.
+        """
+        now = time.time()
+        if self.version is not None:
+            rows = [(self._stored_key(key), self.version, self.encode_value(value), now) for key, value in items]
+            columns = f"key, version, {self.value_column}, last_used"
+        else:
+            rows = [(key, self.encode_value(value), now) for key, value in items]
+            columns = f"key, {self.value_column}, last_used"
+        if not rows:
+            return
+        marks = ", ".join("?" * len(rows[0]))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(f"INSERT OR IGNORE INTO {self.table} ({columns}) VALUES ({marks})", rows)
+            self._size += self._conn.total_changes - before
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        target = int(self.max_entries * EVICT_TO)
+        excess = self._size - target
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+        self._size = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def process_singleton(factory, enabled: bool = True):
+    """
+    Returns a getter that creates factory() on first call and then keeps
+    returning that instance; it returns None when not enabled.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    def get():
+        nonlocal instance
+        if not enabled:
+            return None
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+
+    return get
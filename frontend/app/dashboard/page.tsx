@@ -7,7 +7,7 @@ import SetupModal from "./components/SetupModal";
 import {
   listChatSessions,
   createChatSession,
-  sendChatMessage,
+  streamChatMessage,
   getChatSession,
   type ChatSession,
 } from "@/lib/chatApi";
@@ -193,35 +193,37 @@ export default function DashboardPage() {
       return;
     }
 
+    // Assistant message filled in as tokens stream in
+    const updateAssistant = (update: (content: string) => string) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }];
+      });
+
+    setMessages((prev) => [
+      ...prev,
+      { role: "assistant", content: "", timestamp: new Date() },
+    ]);
+
     try {
-      const data = await sendChatMessage(token, text, currentSessionId);
+      const sessionId = await streamChatMessage(token, text, currentSessionId, {
+        onToken: (chunk) => updateAssistant((content) => content + chunk),
+      });
 
-      if (!data) throw new Error("Empty backend response");
+      if (sessionId === null) throw new Error("Empty backend response");
 
-      if (!currentSessionId && data.session_id) {
-        setCurrentSessionId(data.session_id);
+      if (!currentSessionId && sessionId) {
+        setCurrentSessionId(sessionId);
 
         const sessions = await listChatSessions(token);
         setChatSessions(sessions);
       }
 
-      const assistantMessage: Message = {
-        role: "assistant",
-        content: data.answer || "No answer returned from backend.",
-        timestamp: new Date(),
-      };
-
-      setMessages((prev) => [...prev, assistantMessage]);
+      updateAssistant((content) => content || "No answer returned from backend.");
     } catch (err) {
       console.error("Chat error:", err);
 
-      const errorMessage: Message = {
-        role: "assistant",
-        content: "⚠️ Unable to reach backend.",
-        timestamp: new Date(),
-      };
-
-      setMessages((prev) => [...prev, errorMessage]);
+      updateAssistant((content) => content || "⚠️ Unable to reach backend.");
     }
 
     setIsSending(false);
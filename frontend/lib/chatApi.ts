@@ -71,4 +71,75 @@ export async function sendChatMessage(
   })
   if (!res.ok) return null
   return res.json()
-}
\ No newline at end of file
+}
+
+export type ChatSource = {
+  repo: string
+  path: string | null
+  name: string | null
+  score: number | null
+}
+
+type StreamHandlers = {
+  onSources?: (sessionId: number, sources: ChatSource[]) => void
+  onToken: (text: string) => void
+}
+
+// Streams /chat/query/stream (server-sent events). Resolves with the session
+// id once the answer is complete, or null if the request failed.
+export async function streamChatMessage(
+  token: string,
+  question: string,
+  sessionId: number | null | undefined,
+  handlers: StreamHandlers,
+  signal?: AbortSignal
+): Promise<number | null> {
+  const res = await fetch(`${BASE_URL}/chat/query/stream`, {
+    method: "POST",
+    headers: authHeaders(token),
+    body: JSON.stringify({
+      question,
+      session_id: sessionId ?? null,
+    }),
+    signal,
+  })
+  if (!res.ok || !res.body) return null
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+  let resolvedSessionId: number | null = null
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf("\n\n")
+    while (boundary !== -1) {
+      const raw = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf("\n\n")
+
+      let event = "message"
+      let data = ""
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7)
+        else if (line.startsWith("data: ")) data += line.slice(6)
+      }
+      if (!data) continue
+      const payload = JSON.parse(data)
+
+      if (event === "sources") {
+        resolvedSessionId = payload.session_id
+        handlers.onSources?.(payload.session_id, payload.sources)
+      } else if (event === "token") {
+        handlers.onToken(payload.text)
+      } else if (event === "error") {
+        throw new Error(payload.detail)
+      }
+    }
+  }
+
+  return resolvedSessionId
+}